@@ -1,46 +1,172 @@
-import os
+import json
+from typing import Any, Dict
 
-from flask import Flask, request
+from flask import Blueprint, Flask, Request, current_app, request
 from flask_cors import CORS
 
-from feather_python.middleware import handle_feather_errors
-from feather_python.models import RunRequest
-from feather_python.runtime import PythonRuntime
+from feather_python import service
+from feather_python.errors import JobNotFoundError, JobQueueDisabledError
+from feather_python.middleware import (
+    CompressResponseMiddleware,
+    DecompressRequestMiddleware,
+    handle_feather_errors,
+)
+from feather_python.models import RunRequest, RunResponse
+from feather_python.protocol import MSGPACK_MIMETYPE, pack, pack_frame, unpack
+from feather_python.workspace import UploadFile
 
 
-BASE_TEMPDIR_PATH = os.getenv("FEATHER_BASE_TEMPDIR_PATH", "/tmp/")
-DEFAULT_ENTRYPOINT = "main.py"
-PYTHON_EXECUTABLE_PATH = "python3"
-SUBPROCESS_TIMEOUT = 30  # seconds
+PRIORITY_HEADER = "x-feather-priority"
+JSON_MIMETYPE = "application/json"
 
-app = Flask("feather_python")
-CORS(
-    app,
-    allow_headers=["x-feather-args", "x-feather-env", "x-feather-entrypoint"],
-)
+views = Blueprint("feather_python", __name__)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(self, *args, **kwargs) -> UploadFile:
+        # werkzeug's hook for where uploads are spooled while parsing
+        return UploadFile(dir=service.BASE_TEMPDIR_PATH)
+
+
+def create_app() -> Flask:
+    app = Flask("feather_python")
+    app.request_class = UploadRequest
+    app.config["MAX_CONTENT_LENGTH"] = service.MAX_CONTENT_LENGTH
+    app.wsgi_app = CompressResponseMiddleware(
+        DecompressRequestMiddleware(
+            app.wsgi_app, max_size=service.MAX_DECOMPRESSED_SIZE
+        ),
+        min_size=service.COMPRESSION_MIN_SIZE,
+    )
+    CORS(
+        app,
+        allow_headers=RunRequest.get_header_names()
+        + [PRIORITY_HEADER, "content-encoding"],
+    )
+    app.register_blueprint(views)
+
+    service.start()
+    return app
 
 
-@app.route("/runtimes/python", methods=["GET", "POST"])
+@views.route("/runtimes/python", methods=["GET", "POST"])
+@views.route("/runtimes/python/v/<python_version>", methods=["GET", "POST"])
 @handle_feather_errors
-def run():
+def run(python_version=None):
     """
+    The interpreter is picked from the path (/runtimes/python/3.11) or
+    the x-feather-python-version header, by name or major.minor version.
+
+    With `x-feather-deduplicate: 1`, identical requests that arrive while
+    one of them is running share its result instead of running again.
+    Only use it for deterministic programs.
+
+    When FEATHER_WORKERS is set, runs are forwarded to those runtime
+    workers instead of running here (see feather_python.dispatcher).
+
     Response behavior:
     stdout if exit code was 0 (OK), else the stderr output as
-    text/plain
+    text/plain.
+
+    With `Accept: application/json` or `Accept: application/msgpack`,
+    the whole RunResponse: exit code, both streams, whether either was
+    truncated, and timing/resource stats.
+    """
+
+    run_request = RunRequest.from_request(request)
+    run_request.python_version = python_version or run_request.python_version
+    run_response = service.run(run_request)
+
+    return make_run_response(run_response)
+
+
+@views.route("/runtimes/python/capacity", methods=["GET"])
+def capacity():
+    """
+    Capacity advertisement and health check for dispatchers.
+    """
+    return {
+        **service.worker_load.to_dict(),
+        "python_versions": sorted(service.get_runtimes().interpreters),
+    }
+
+
+@views.route("/runtimes/python/jobs", methods=["POST"])
+@handle_feather_errors
+def submit_job():
+    """
+    Queue a run and return its job id right away (202). The request is
+    the same as for /runtimes/python. Set `x-feather-priority` to
+    `interactive` to run it ahead of `bulk` jobs (the default).
     """
+    if service.job_queue is None:
+        raise JobQueueDisabledError()
+
+    from feather_python.jobs import JobPriority
 
     run_request = RunRequest.from_request(request)
-    runtime = PythonRuntime(
-        python_path=PYTHON_EXECUTABLE_PATH,
-        base_tempdir_path=BASE_TEMPDIR_PATH,
-        default_entrypoint=DEFAULT_ENTRYPOINT,
-        timeout=SUBPROCESS_TIMEOUT,
+    priority = JobPriority.from_name(
+        request.headers.get(PRIORITY_HEADER, "bulk")
+    )
+    job = service.job_queue.submit(
+        "run", pack(run_request.to_frame()), priority
+    )
+
+    return make_data_response({"id": job.id, "status": job.status.value}, 202)
+
+
+@views.route("/runtimes/python/jobs/<job_id>", methods=["GET"])
+@handle_feather_errors
+def get_job(job_id):
+    if service.job_queue is None:
+        raise JobQueueDisabledError()
+
+    job = service.job_queue.get(job_id)
+    if job is None:
+        raise JobNotFoundError()
+
+    return make_data_response(
+        {
+            "id": job.id,
+            "status": job.status.value,
+            "result": job.result and unpack(job.result),
+        }
     )
 
-    run_response = runtime.run(run_request)
+
+def make_run_response(run_response: RunResponse):
+    if accepts(JSON_MIMETYPE) or accepts(MSGPACK_MIMETYPE):
+        return make_data_response(run_response.to_dict())
 
     return (
         run_response.stdout
         if run_response.status_code == 0
         else run_response.stderr
     )
+
+
+def make_data_response(data: Dict[str, Any], status: int = 200):
+    """
+    Serialize API data as a msgpack frame if the client asked for one,
+    else as compact JSON.
+    """
+    if accepts(MSGPACK_MIMETYPE):
+        return current_app.response_class(
+            pack_frame(data), status=status, mimetype=MSGPACK_MIMETYPE
+        )
+
+    body = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return current_app.response_class(
+        body, status=status, mimetype=JSON_MIMETYPE
+    )
+
+
+def accepts(mimetype: str) -> bool:
+    # exact matches only, so that browsers' */* keeps getting plain text
+    return any(
+        value.split(";")[0].strip().lower() == mimetype and quality > 0
+        for value, quality in request.accept_mimetypes
+    )
+
+
+app = create_app()
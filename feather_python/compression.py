@@ -0,0 +1,141 @@
+"""
+gzip and zstd codecs for request and response bodies.
+
+zstd needs the optional `zstandard` package; without it only gzip is
+offered and zstd request bodies are rejected as unsupported.
+"""
+import gzip
+import io
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from feather_python.errors import (
+    BaseFeatherError,
+    InvalidCompressedBodyError,
+    PayloadTooLargeError,
+    UnsupportedContentEncodingError,
+)
+
+
+CHUNK_SIZE = 64 * 1024  # bytes
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def get_zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+
+    return zstandard
+
+
+def get_supported_encodings() -> List[str]:
+    # in order of preference for responses
+    return (["zstd"] if get_zstandard() else []) + ["gzip"]
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Read-only stream of the decompressed body. Reads are bounded, so a
+    small compressed body can't expand in memory, and reading past
+    `max_size` decompressed bytes raises PayloadTooLargeError.
+    """
+
+    def __init__(self, stream: BinaryIO, encoding: str, max_size: int):
+        self.stream = stream
+        self.encoding = encoding
+        self.max_size = max_size
+        self.size = 0
+        self._reader = None
+        self._errors = ()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._reader is None:
+            self._reader, self._errors = self._open()
+
+        # read one byte past the limit to tell "exactly max_size" apart
+        limit = min(len(buffer), self.max_size + 1 - self.size)
+        try:
+            data = self._reader.read(limit)
+        except BaseFeatherError:
+            raise
+        except self._errors:
+            raise InvalidCompressedBodyError()
+
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise PayloadTooLargeError()
+
+        buffer[: len(data)] = data
+        return len(data)
+
+    def _open(self):
+        if self.encoding == "gzip":
+            reader = gzip.GzipFile(fileobj=self.stream, mode="rb")
+            return reader, (OSError, EOFError, zlib.error)
+
+        zstandard = self.encoding == "zstd" and get_zstandard()
+        if zstandard:
+            reader = zstandard.ZstdDecompressor().stream_reader(self.stream)
+            return reader, (zstandard.ZstdError,)
+
+        raise UnsupportedContentEncodingError()
+
+
+def compress_chunks(
+    chunks: Iterable[bytes], encoding: str
+) -> Iterator[bytes]:
+    """Compress a response body chunk by chunk, without buffering it."""
+    compressor = get_compressor(encoding)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def get_compressor(encoding: str):
+    if encoding == "zstd":
+        return get_zstandard().ZstdCompressor().compressobj()
+
+    return zlib.compressobj(wbits=GZIP_WBITS)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    qualities = parse_accept_qualities(accept_encoding)
+    for encoding in get_supported_encodings():
+        if qualities.get(encoding, qualities.get("*", 0)) > 0:
+            return encoding
+
+    return None
+
+
+def parse_accept_qualities(header_value: str) -> Dict[str, float]:
+    """
+    Map each value of an Accept or Accept-Encoding header to its quality,
+    ignoring any parameters other than `q`. werkzeug.http has a parser,
+    but the lean WSGI handler avoids werkzeug.
+    """
+    qualities = {}
+    for item in header_value.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if name.strip():
+            qualities[name.strip().lower()] = quality
+
+    return qualities
@@ -0,0 +1,221 @@
+"""
+Dispatcher mode: forward runs to a fleet of runtime workers.
+
+Workers are ordinary instances of this service. Each one advertises its
+capacity at /runtimes/python/capacity, which doubles as its health check.
+The dispatcher sends every RunRequest as a msgpack frame to the
+least-loaded healthy worker and retries on another one if the worker
+can't be reached or is busy (a 503, such as from a full heavy lane). A
+busy worker stays in rotation. A run that times out on a worker isn't
+retried, since the code may already have run there. All attempts share
+one deadline, `timeout`.
+"""
+import http.client
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import List, Optional, Set
+
+from feather_python.errors import (
+    NoWorkerAvailableError,
+    RemoteFeatherError,
+    RunTimeoutError,
+    UnsupportedPythonVersionError,
+)
+from feather_python.models import RunResponse
+from feather_python.protocol import MSGPACK_MIMETYPE, pack_frame, read_frame
+
+
+logger = logging.getLogger(__name__)
+
+RUN_PATH = "/runtimes/python"
+CAPACITY_PATH = "/runtimes/python/capacity"
+UNAVAILABLE_STATUS_CODES = (502,)
+BUSY_STATUS_CODES = (503,)
+HEALTH_CHECK_TIMEOUT = 2  # seconds
+
+
+class Worker:
+    def __init__(self, url: str, capacity: int = 1) -> None:
+        self.url = url.rstrip("/")
+        self.capacity = capacity
+        self.inflight = 0
+        self.remote_inflight = 0
+        self.healthy = True
+        # None until the worker advertises them in a health check
+        self.python_versions: Optional[Set[str]] = None
+
+    @property
+    def load(self) -> float:
+        inflight = max(self.inflight, self.remote_inflight)
+        return inflight / max(self.capacity, 1)
+
+    def supports(self, python_version: Optional[str]) -> bool:
+        return (
+            not python_version
+            or self.python_versions is None
+            or python_version in self.python_versions
+        )
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        urls: List[str],
+        timeout: float,
+        health_check_interval: float = 5,
+    ) -> None:
+        self.workers = [Worker(url) for url in urls]
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def dispatch(self, run_request: "RunRequest") -> RunResponse:
+        body = pack_frame(run_request.to_frame())
+        deadline = time.monotonic() + self.timeout
+        tried: List[Worker] = []
+
+        python_version = run_request.python_version
+
+        while True:
+            worker = self.acquire(exclude=tried, python_version=python_version)
+            if worker is None:
+                if not tried and self.is_unsupported(python_version):
+                    raise UnsupportedPythonVersionError()
+                raise NoWorkerAvailableError()
+            tried.append(worker)
+
+            try:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise RunTimeoutError()
+                return self.forward(worker, body, timeout)
+            except NoWorkerAvailableError:
+                # busy, not broken: try the next worker
+                pass
+            except TimeoutError:
+                worker.healthy = False
+                raise RunTimeoutError()
+            except (OSError, http.client.HTTPException):
+                # URLError (which wraps connect timeouts too) is an OSError
+                worker.healthy = False
+            finally:
+                self.release(worker)
+
+    def acquire(
+        self, exclude: List[Worker], python_version: Optional[str] = None
+    ) -> Optional[Worker]:
+        with self._lock:
+            candidates = [
+                worker
+                for worker in self.workers
+                if worker.healthy
+                and worker not in exclude
+                and worker.supports(python_version)
+            ]
+            if not candidates:
+                return None
+
+            worker = min(candidates, key=lambda worker: worker.load)
+            worker.inflight += 1
+            return worker
+
+    def is_unsupported(self, python_version: Optional[str]) -> bool:
+        """Whether there are healthy workers, but none has the version."""
+        healthy = [worker for worker in self.workers if worker.healthy]
+        return bool(healthy) and not any(
+            worker.supports(python_version) for worker in healthy
+        )
+
+    def release(self, worker: Worker) -> None:
+        with self._lock:
+            worker.inflight -= 1
+
+    def forward(
+        self, worker: Worker, body: bytes, timeout: float
+    ) -> RunResponse:
+        http_request = urllib.request.Request(
+            worker.url + RUN_PATH,
+            data=body,
+            headers={
+                "Content-Type": MSGPACK_MIMETYPE,
+                "Accept": MSGPACK_MIMETYPE,
+            },
+            method="POST",
+        )
+
+        try:
+            with urllib.request.urlopen(
+                http_request, timeout=timeout
+            ) as response:
+                frame = read_frame(response)
+        except urllib.error.HTTPError as e:
+            if e.code in BUSY_STATUS_CODES:
+                raise NoWorkerAvailableError()
+            if e.code in UNAVAILABLE_STATUS_CODES:
+                raise urllib.error.URLError(e.reason)
+            raise get_remote_error(e)
+
+        return RunResponse.from_dict(frame)
+
+    def check_health(self) -> None:
+        for worker in self.workers:
+            try:
+                with urllib.request.urlopen(
+                    worker.url + CAPACITY_PATH, timeout=HEALTH_CHECK_TIMEOUT
+                ) as response:
+                    capacity = json.load(response)
+                worker_capacity = int(capacity["capacity"])
+                remote_inflight = int(capacity["inflight"])
+                python_versions = capacity.get("python_versions")
+                if python_versions is not None:
+                    python_versions = {str(name) for name in python_versions}
+            except (
+                OSError,
+                ValueError,
+                KeyError,
+                TypeError,
+                AttributeError,
+                http.client.HTTPException,
+            ):
+                # unreachable, or not a runtime worker
+                worker.healthy = False
+                continue
+
+            with self._lock:
+                worker.capacity = worker_capacity
+                worker.remote_inflight = remote_inflight
+                worker.python_versions = python_versions
+                worker.healthy = True
+
+    def start(self) -> None:
+        """Check worker health now and then periodically in background."""
+        self.check_health()
+        thread = threading.Thread(target=self._health_check_loop)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _health_check_loop(self) -> None:
+        while not self._stopped.wait(self.health_check_interval):
+            try:
+                self.check_health()
+            except Exception:
+                # keep checking, or unhealthy workers never come back
+                logger.exception("Worker health check failed")
+
+
+def get_remote_error(e: urllib.error.HTTPError) -> RemoteFeatherError:
+    try:
+        error = json.loads(e.read())
+        title, message = error["error"], error["message"]
+    except (OSError, ValueError, KeyError, TypeError):
+        title, message = "Worker error", f"The runtime worker failed: {e}"
+
+    return RemoteFeatherError(title, message, e.code)
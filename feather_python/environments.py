@@ -0,0 +1,99 @@
+"""
+Named, pre-built package environments that runs can opt into.
+
+An environment is a directory of installed packages (for example built
+with `pip install --target`), optionally with one subdirectory per
+major.minor Python version for packages with compiled extensions. It is
+shared by every run as a layer on PYTHONPATH, so interpreters that are
+configured to ignore PYTHON* variables (-I, -E) can't use it.
+
+Runs don't write bytecode into the layer, but nothing stops user code
+from writing to it: make the directory read-only for the service user
+(e.g. `chmod -R a-w`) once it is built and precompiled.
+"""
+import os
+import shlex
+import subprocess
+from typing import Dict, Optional
+
+from feather_python.errors import (
+    IncompatibleEnvironmentError,
+    UnknownEnvironmentError,
+)
+
+
+class Environment:
+    def __init__(self, name: str, path: str) -> None:
+        self.name = name
+        self.path = path
+
+    def site_dir(self, interpreter: "Interpreter") -> str:
+        versioned_path = os.path.join(self.path, interpreter.short_version)
+        return versioned_path if os.path.isdir(versioned_path) else self.path
+
+    def get_env(self, interpreter: "Interpreter") -> Dict[str, str]:
+        if interpreter.ignores_environment:
+            raise IncompatibleEnvironmentError()
+
+        # runs must never write bytecode into the shared layer
+        return {
+            "PYTHONPATH": self.site_dir(interpreter),
+            "PYTHONDONTWRITEBYTECODE": "1",
+        }
+
+    def precompile(self, interpreter: "Interpreter") -> None:
+        """
+        Write bytecode for every module in the layer, so that heavy
+        imports don't compile on first use. The .pyc files are tagged
+        per interpreter, so one layer can be warmed for several of them.
+        """
+        subprocess.run(
+            [
+                interpreter.python_path,
+                "-m",
+                "compileall",
+                "-q",
+                self.site_dir(interpreter),
+            ],
+            capture_output=True,
+            check=True,
+        )
+
+
+class EnvironmentRegistry:
+    def __init__(self) -> None:
+        self.environments: Dict[str, Environment] = {}
+
+    def register(self, environment: Environment) -> None:
+        self.environments[environment.name] = environment
+
+    def get(self, name: Optional[str]) -> Optional[Environment]:
+        if not name:
+            return None
+
+        try:
+            return self.environments[name]
+        except KeyError:
+            raise UnknownEnvironmentError()
+
+    def precompile(self, runtimes: "RuntimeRegistry") -> None:
+        interpreters = set(runtimes.interpreters.values())
+        for environment in self.environments.values():
+            for interpreter in interpreters:
+                environment.precompile(interpreter)
+
+    @classmethod
+    def from_config(cls, config: str) -> "EnvironmentRegistry":
+        """
+        `config` is a shell-quoted list of name=path assignments,
+        e.g. `data=/opt/feather/envs/data ml=/opt/feather/envs/ml`.
+        """
+        assignments = config and shlex.split(config) or []
+
+        registry = cls()
+        for assignment in assignments:
+            if "=" in assignment:
+                name, path = assignment.split("=", maxsplit=1)
+                registry.register(Environment(name, path))
+
+        return registry
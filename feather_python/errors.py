@@ -47,3 +47,100 @@ class UnsupportedContentTypeError(BaseFeatherError):
         " Please check documentation for supported formats"
     )
     status_code = 415
+
+
+class InvalidFrameError(BaseFeatherError):
+    title = "Invalid frame"
+    message = (
+        "The binary request body should be a single length-prefixed"
+        " msgpack frame. Please verify with documentation."
+    )
+    status_code = 400
+
+
+class UnsupportedPythonVersionError(BaseFeatherError):
+    title = "Unsupported Python version"
+    message = (
+        "The requested Python version isn't available on this runtime."
+        " Set `x-feather-python-version` to one of the configured versions."
+    )
+    status_code = 400
+
+
+class UnknownEnvironmentError(BaseFeatherError):
+    title = "Unknown environment"
+    message = (
+        "The environment set with `x-feather-environment` isn't"
+        " configured on this runtime."
+    )
+    status_code = 400
+
+
+class IncompatibleEnvironmentError(BaseFeatherError):
+    title = "Incompatible environment"
+    message = (
+        "The selected Python interpreter runs isolated (-I or -E), so it"
+        " can't load packages from `x-feather-environment`."
+    )
+    status_code = 400
+
+
+class RunTimeoutError(BaseFeatherError):
+    title = "Run timed out"
+    message = "The code didn't finish running within the time limit."
+    status_code = 504
+
+
+class NoWorkerAvailableError(BaseFeatherError):
+    title = "No worker available"
+    message = "None of the runtime workers could take the run. Try again."
+    status_code = 503
+
+
+class RemoteFeatherError(BaseFeatherError):
+    """An error returned by a runtime worker, relayed as-is."""
+
+    def __init__(self, title: str, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.title = title
+        self.message = message
+        self.status_code = status_code
+
+
+class InvalidPriorityError(BaseFeatherError):
+    title = "Invalid priority"
+    message = "`x-feather-priority` should be either `interactive` or `bulk`."
+    status_code = 400
+
+
+class JobNotFoundError(BaseFeatherError):
+    title = "Job not found"
+    message = "There is no job with this id."
+    status_code = 404
+
+
+class JobQueueDisabledError(BaseFeatherError):
+    title = "Job queue disabled"
+    message = "This runtime isn't configured with a job queue."
+    status_code = 501
+
+
+class PayloadTooLargeError(BaseFeatherError):
+    title = "Payload too large"
+    message = "The decompressed request body is larger than the allowed size."
+    status_code = 413
+
+
+class InvalidCompressedBodyError(BaseFeatherError):
+    title = "Invalid compressed body"
+    message = "The request body couldn't be decompressed with its encoding."
+    status_code = 400
+
+
+class UnsupportedContentEncodingError(BaseFeatherError):
+    title = "Unsupported content encoding"
+    message = (
+        "The content encoding of request is not supported."
+        " Please use `gzip` or `zstd`."
+    )
+    status_code = 415
@@ -0,0 +1,296 @@
+"""
+Durable job queue for fire-and-forget runs, such as bulk grading.
+
+Jobs are stored in SQLite, so they survive worker restarts. Workers
+(threads in any process sharing the database file) lease the most urgent
+job, run it and write the result back. A job whose lease expires, because
+its worker died mid-run, goes back to the queue.
+"""
+import contextlib
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from enum import Enum
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from feather_python.errors import InvalidPriorityError
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class JobPriority(Enum):
+    # lower values are leased first
+    INTERACTIVE = 0
+    BULK = 1
+
+    @classmethod
+    def from_name(cls, name: str) -> "JobPriority":
+        try:
+            return cls[name.upper()]
+        except KeyError:
+            raise InvalidPriorityError()
+
+
+class Job:
+    def __init__(
+        self,
+        id: str,
+        kind: str,
+        priority: JobPriority,
+        status: JobStatus,
+        payload: bytes,
+        result: Optional[bytes] = None,
+        attempts: int = 0,
+    ) -> None:
+        self.id = id
+        self.kind = kind
+        self.priority = priority
+        self.status = status
+        self.payload = payload
+        self.result = result
+        self.attempts = attempts
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            kind=row["kind"],
+            priority=JobPriority(row["priority"]),
+            status=JobStatus(row["status"]),
+            payload=row["payload"],
+            result=row["result"],
+            attempts=row["attempts"],
+        )
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    result BLOB,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_priority
+    ON jobs (status, priority, created_at);
+"""
+
+
+class JobQueue:
+    def __init__(
+        self, path: str, lease_duration: float, max_attempts: int = 3
+    ) -> None:
+        self.path = path
+        self.lease_duration = lease_duration
+        self.max_attempts = max_attempts
+
+        with self.connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        # one short-lived connection per operation keeps this safe to use
+        # from any thread or process
+        connection = sqlite3.connect(
+            self.path, timeout=30, isolation_level=None
+        )
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(
+        self, kind: str, payload: bytes, priority: JobPriority
+    ) -> Job:
+        job = Job(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            priority=priority,
+            status=JobStatus.QUEUED,
+            payload=payload,
+        )
+        with self.connect() as connection:
+            connection.execute(
+                "INSERT INTO jobs"
+                " (id, kind, priority, status, payload, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.kind,
+                    job.priority.value,
+                    job.status.value,
+                    job.payload,
+                    time.time(),
+                ),
+            )
+
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.connect() as connection:
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+
+        return row and Job.from_row(row)
+
+    def lease(self, owner: str) -> Optional[Job]:
+        """
+        Take the most urgent queued job, or one whose lease has expired.
+        """
+        now = time.time()
+        with self.connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(connection, now)
+                row = connection.execute(
+                    "SELECT * FROM jobs WHERE status = ?"
+                    " ORDER BY priority, created_at LIMIT 1",
+                    (JobStatus.QUEUED.value,),
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE jobs SET status = ?,"
+                        " attempts = attempts + 1, lease_owner = ?,"
+                        " lease_expires_at = ? WHERE id = ?",
+                        (
+                            JobStatus.RUNNING.value,
+                            owner,
+                            now + self.lease_duration,
+                            row["id"],
+                        ),
+                    )
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+
+        job = Job.from_row(row)
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        return job
+
+    def complete(self, job: Job, owner: str, result: bytes) -> bool:
+        return self._finish(job, owner, JobStatus.DONE, result)
+
+    def fail(self, job: Job, owner: str, result: bytes) -> bool:
+        return self._finish(job, owner, JobStatus.FAILED, result)
+
+    def _finish(
+        self, job: Job, owner: str, status: JobStatus, result: bytes
+    ) -> bool:
+        # a worker that lost its lease must not overwrite the new owner's
+        with self.connect() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_owner = NULL,"
+                " lease_expires_at = NULL"
+                " WHERE id = ? AND status = ? AND lease_owner = ?",
+                (
+                    status.value,
+                    result,
+                    job.id,
+                    JobStatus.RUNNING.value,
+                    owner,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def _expire_leases(self, connection: sqlite3.Connection, now: float):
+        # jobs that keep killing their workers are given up on
+        connection.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ?"
+            " END, lease_owner = NULL, lease_expires_at = NULL"
+            " WHERE status = ? AND lease_expires_at < ?",
+            (
+                self.max_attempts,
+                JobStatus.FAILED.value,
+                JobStatus.QUEUED.value,
+                JobStatus.RUNNING.value,
+                now,
+            ),
+        )
+
+
+class JobWorker:
+    """
+    Background threads that lease jobs from the queue and run them.
+    `handler` turns a leased job into its result and whether it passed.
+    Jobs are only leased while `has_capacity` says there is idle capacity,
+    so they don't compete with interactive runs.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Job], Tuple[bool, bytes]],
+        concurrency: int = 1,
+        poll_interval: float = 1,
+        has_capacity: Callable[[], bool] = lambda: True,
+    ) -> None:
+        self.queue = queue
+        self.handler = handler
+        self.has_capacity = has_capacity
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        for _ in range(self.concurrency):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        for thread in self.threads:
+            thread.join()
+
+    def run_once(self, owner: str) -> Optional[Job]:
+        if not self.has_capacity():
+            return None
+
+        job = self.queue.lease(owner)
+        if job is None:
+            return None
+
+        try:
+            ok, result = self.handler(job)
+        except Exception:
+            # leave the lease to expire, so the job is retried
+            logger.exception("Job %s failed unexpectedly", job.id)
+            return job
+
+        if ok:
+            self.queue.complete(job, owner, result)
+        else:
+            self.queue.fail(job, owner, result)
+
+        return job
+
+    def _work(self) -> None:
+        owner = uuid.uuid4().hex
+        while not self._stopped.is_set():
+            if self.run_once(owner) is None:
+                self._stopped.wait(self.poll_interval)
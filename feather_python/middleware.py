@@ -1,5 +1,14 @@
+import io
 from functools import wraps
 
+from werkzeug.wsgi import LimitedStream
+
+from feather_python.compression import (
+    CHUNK_SIZE,
+    DecompressingReader,
+    choose_encoding,
+    compress_chunks,
+)
 from feather_python.errors import BaseFeatherError
 
 
@@ -16,3 +25,81 @@ def handle_feather_errors(fn):
             }, status_code
 
     return wrapper
+
+
+class DecompressRequestMiddleware:
+    """
+    Transparently decompress `Content-Encoding: gzip/zstd` request bodies.
+    Decoding errors surface as feather errors when the view reads the body.
+    """
+
+    def __init__(self, wsgi_app, max_size: int) -> None:
+        self.wsgi_app = wsgi_app
+        self.max_size = max_size
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get("HTTP_CONTENT_ENCODING", "").strip().lower()
+        if encoding in ("", "identity"):
+            return self.wsgi_app(environ, start_response)
+
+        stream = environ["wsgi.input"]
+        content_length = environ.pop("CONTENT_LENGTH", "")
+        if content_length.isdigit():
+            # don't read past the compressed body
+            stream = LimitedStream(stream, int(content_length))
+
+        reader = DecompressingReader(stream, encoding, self.max_size)
+        environ["wsgi.input"] = io.BufferedReader(reader, CHUNK_SIZE)
+        environ["wsgi.input_terminated"] = True
+        del environ["HTTP_CONTENT_ENCODING"]
+
+        return self.wsgi_app(environ, start_response)
+
+
+class CompressResponseMiddleware:
+    """
+    Compress responses of at least `min_size` bytes (or of unknown size)
+    for clients that accept gzip or zstd, streaming chunk by chunk.
+    """
+
+    def __init__(self, wsgi_app, min_size: int) -> None:
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+
+    def __call__(self, environ, start_response):
+        encoding = choose_encoding(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if not encoding or environ["REQUEST_METHOD"] == "HEAD":
+            return self.wsgi_app(environ, start_response)
+
+        compressed = False
+
+        def compressing_start_response(status, headers, exc_info=None):
+            nonlocal compressed
+            compressed = self.should_compress(status, headers)
+            if compressed:
+                headers = [
+                    (name, value)
+                    for name, value in headers
+                    if name.lower() != "content-length"
+                ]
+                headers.append(("Content-Encoding", encoding))
+                headers.append(("Vary", "Accept-Encoding"))
+
+            return start_response(status, headers, exc_info)
+
+        app_iter = self.wsgi_app(environ, compressing_start_response)
+        if not compressed:
+            return app_iter
+
+        return compress_chunks(app_iter, encoding)
+
+    def should_compress(self, status: str, headers) -> bool:
+        if status[:3] in ("204", "304"):
+            return False
+
+        headers = {name.lower(): value for name, value in headers}
+        if "content-encoding" in headers:
+            return False
+
+        content_length = headers.get("content-length")
+        return content_length is None or int(content_length) >= self.min_size
@@ -1,15 +1,20 @@
+import hashlib
+import json
 import shlex
 from enum import Enum
 from io import BytesIO
-from typing import Any, Dict, List, Optional, Union
-
-from werkzeug.datastructures import FileStorage
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Union
 
 from feather_python.errors import (
     CodeNotFoundError,
     IncorrectJSONError,
     UnsupportedContentTypeError,
 )
+from feather_python.protocol import MSGPACK_MIMETYPE, read_frame
+
+if TYPE_CHECKING:
+    # werkzeug is slow to import, and the lean WSGI handler doesn't need it
+    from werkzeug.datastructures import FileStorage
 
 
 class RunRequestMode(Enum):
@@ -21,27 +26,102 @@ class RunRequest:
     ARGS_HEADER = "x-feather-args"
     ENV_HEADER = "x-feather-env"
     ENTRYPOINT_HEADER = "x-feather-entrypoint"
+    PYTHON_VERSION_HEADER = "x-feather-python-version"
+    ENVIRONMENT_HEADER = "x-feather-environment"
+    DEDUPLICATE_HEADER = "x-feather-deduplicate"
+    EXERCISE_HEADER = "x-feather-exercise"
 
     def __init__(
         self,
         code: Optional[str] = None,
-        files: Optional[Dict[str, FileStorage]] = None,
+        files: Optional[Dict[str, "FileStorage"]] = None,
         entrypoint: Optional[str] = None,
         args: Optional[List[str]] = None,
         env: Optional[Dict[str, Any]] = None,
+        python_version: Optional[str] = None,
+        environment: Optional[str] = None,
+        deduplicate: bool = False,
+        exercise: Optional[str] = None,
     ) -> None:
         self.code = code
         self.files = files
         self.entrypoint = entrypoint
         self.args = args
         self.env = env
+        self.python_version = python_version
+        self.environment = environment
+        self.deduplicate = deduplicate
+        # groups submissions of one exercise for the scheduler's cost model
+        self.exercise = exercise
+
+    @classmethod
+    def get_header_names(cls) -> List[str]:
+        """Every x-feather-* header a run can be configured with."""
+        return [
+            value
+            for name, value in vars(cls).items()
+            if name.endswith("_HEADER")
+        ]
 
     @property
     def mode(self) -> RunRequestMode:
         return RunRequestMode.FILES if self.files else RunRequestMode.CODE
 
+    def to_frame(self) -> Dict[str, Any]:
+        """Inverse of `from_frame`, for forwarding the run elsewhere."""
+        frame = {
+            "entrypoint": self.entrypoint,
+            "args": self.args,
+            "env": self.env,
+            "python_version": self.python_version,
+            "environment": self.environment,
+            "exercise": self.exercise,
+        }
+        if self.files:
+            frame["files"] = {
+                filename: read_file(file)
+                for filename, file in self.files.items()
+            }
+        else:
+            frame["code"] = self.code
+
+        return frame
+
+    def fingerprint(self, interpreter: Optional[str] = None) -> str:
+        """
+        Hash of everything that affects the run's output. File streams
+        are read in chunks and rewound, so they can still be saved.
+        `interpreter` names the interpreter the run resolves to, so that
+        a version and its aliases share a fingerprint; it defaults to the
+        requested python_version.
+        """
+        digest = hashlib.sha256()
+        metadata = [
+            self.code,
+            self.entrypoint,
+            self.args,
+            self.env,
+            interpreter or self.python_version,
+            self.environment,
+        ]
+        serialized = json.dumps(metadata, sort_keys=True, default=repr)
+        digest.update(serialized.encode("utf-8"))
+
+        for filename in sorted(self.files or {}):
+            stream = self.files[filename].stream
+            position = stream.tell()
+            digest.update(b"\0" + filename.encode("utf-8") + b"\0")
+            for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                digest.update(chunk)
+            stream.seek(position)
+
+        return digest.hexdigest()
+
     @classmethod
     def from_request(cls, request: "flask.Request") -> "RunRequest":
+        if request.mimetype == MSGPACK_MIMETYPE:
+            return cls.from_frame(request)
+
         file_getter = cls._get_files_getter(request.mimetype)
         code_getter = cls._get_code_getter(request.mimetype)
         if not file_getter and not code_getter:
@@ -50,16 +130,140 @@ class RunRequest:
         files = file_getter and file_getter(request)
         code = code_getter and code_getter(request)
 
-        args = cls._get_args(request.headers.get(RunRequest.ARGS_HEADER, ""))
-        env = cls._get_env(request.headers.get(RunRequest.ENV_HEADER, ""))
+        return cls.from_headers(request.headers, code=code, files=files)
+
+    @classmethod
+    def from_headers(
+        cls,
+        headers: Mapping[str, str],
+        code: Optional[str] = None,
+        files: Optional[Dict[str, "FileStorage"]] = None,
+    ) -> "RunRequest":
+        """
+        Build a request from already-parsed code or files, reading the
+        run options from the x-feather-* headers.
+        """
+        args = cls._get_args(headers.get(cls.ARGS_HEADER, ""))
+        env = cls._get_env(headers.get(cls.ENV_HEADER, ""))
         entrypoint = cls._get_entrypoint(
-            request.headers.get(RunRequest.ENTRYPOINT_HEADER, "")
+            headers.get(cls.ENTRYPOINT_HEADER, "")
         )
+        python_version = headers.get(cls.PYTHON_VERSION_HEADER) or None
+        environment = headers.get(cls.ENVIRONMENT_HEADER) or None
+        deduplicate = cls._get_flag(headers.get(cls.DEDUPLICATE_HEADER, ""))
+        exercise = headers.get(cls.EXERCISE_HEADER) or None
 
         return cls(
-            code=code, files=files, args=args, env=env, entrypoint=entrypoint
+            code=code,
+            files=files,
+            args=args,
+            env=env,
+            entrypoint=entrypoint,
+            python_version=python_version,
+            environment=environment,
+            deduplicate=deduplicate,
+            exercise=exercise,
         )
 
+    @classmethod
+    def from_frame(cls, request: "flask.Request") -> "RunRequest":
+        return cls.from_payload(read_frame(request.stream), request.headers)
+
+    @classmethod
+    def from_payload(
+        cls, payload: Any, headers: Optional[Mapping[str, str]] = None
+    ) -> "RunRequest":
+        """
+        Payload schema (msgpack map):
+        {"code": str} or {"files": {path: bytes | str}}, with optional
+        "args" (list of str), "env" (map of str), "entrypoint" (str),
+        "python_version" (str), "environment" (str), "deduplicate"
+        (bool) and "exercise" (str). Fields that are missing fall back to
+        the x-feather-* headers.
+        """
+        headers = headers or {}
+        cls._check_payload_types(payload)
+
+        code, raw_files = payload.get("code"), payload.get("files")
+        if isinstance(code, bytes):
+            try:
+                code = code.decode("utf-8")
+            except UnicodeDecodeError:
+                raise IncorrectJSONError()
+        if raw_files is not None:
+            files = create_filestorages(raw_files)
+            if not files:
+                raise CodeNotFoundError()
+        elif code:
+            files = None
+        else:
+            raise CodeNotFoundError()
+
+        args = payload.get("args")
+        if args is None:
+            args = cls._get_args(headers.get(cls.ARGS_HEADER, ""))
+        env = payload.get("env")
+        if env is None:
+            env = cls._get_env(headers.get(cls.ENV_HEADER, ""))
+        entrypoint = payload.get("entrypoint") or cls._get_entrypoint(
+            headers.get(cls.ENTRYPOINT_HEADER, "")
+        )
+        python_version = payload.get("python_version") or (
+            headers.get(cls.PYTHON_VERSION_HEADER) or None
+        )
+        environment = payload.get("environment") or (
+            headers.get(cls.ENVIRONMENT_HEADER) or None
+        )
+        deduplicate = bool(payload.get("deduplicate")) or cls._get_flag(
+            headers.get(cls.DEDUPLICATE_HEADER, "")
+        )
+        exercise = payload.get("exercise") or (
+            headers.get(cls.EXERCISE_HEADER) or None
+        )
+
+        return cls(
+            code=None if files else code,
+            files=files,
+            args=args,
+            env=env,
+            entrypoint=entrypoint,
+            python_version=python_version,
+            environment=environment,
+            deduplicate=deduplicate,
+            exercise=exercise,
+        )
+
+    @staticmethod
+    def _check_payload_types(payload: Any) -> None:
+        def is_str_list(value):
+            return isinstance(value, list) and all(
+                isinstance(item, str) for item in value
+            )
+
+        def is_str_map(value):
+            return isinstance(value, dict) and all(
+                isinstance(key, str) and isinstance(item, str)
+                for key, item in value.items()
+            )
+
+        if not isinstance(payload, dict):
+            raise IncorrectJSONError()
+
+        checks = {
+            "code": lambda value: isinstance(value, (str, bytes)),
+            "files": lambda value: isinstance(value, dict),
+            "args": is_str_list,
+            "env": is_str_map,
+            "entrypoint": lambda value: isinstance(value, str),
+            "python_version": lambda value: isinstance(value, str),
+            "environment": lambda value: isinstance(value, str),
+            "deduplicate": lambda value: isinstance(value, bool),
+            "exercise": lambda value: isinstance(value, str),
+        }
+        for field, check in checks.items():
+            if payload.get(field) is not None and not check(payload[field]):
+                raise IncorrectJSONError()
+
     @classmethod
     def _get_files_getter(cls, mimetype: str):
         getters = {
@@ -81,13 +285,9 @@ class RunRequest:
     @staticmethod
     def _get_files_from_json(
         request: "flask.Request",
-    ) -> Dict[str, FileStorage]:
+    ) -> Dict[str, "FileStorage"]:
         if "files" in request.json:
-            raw_files = request.json["files"]
-            files = {
-                str(filename): create_filestorage(filename, content)
-                for filename, content in raw_files.items()
-            }
+            files = create_filestorages(request.json["files"])
         else:
             raise IncorrectJSONError()
 
@@ -99,7 +299,7 @@ class RunRequest:
     @staticmethod
     def _get_files_from_multipart(
         request: "flask.Request",
-    ) -> Dict[str, FileStorage]:
+    ) -> Dict[str, "FileStorage"]:
         files = dict(request.files)
         if not files:
             raise CodeNotFoundError()
@@ -142,16 +342,76 @@ class RunRequest:
     def _get_entrypoint(header_value: str) -> Union[str, None]:
         return header_value or None
 
+    @staticmethod
+    def _get_flag(header_value: str) -> bool:
+        return header_value.strip().lower() in ("1", "true", "yes")
+
 
 class RunResponse:
     def __init__(
-        self, status_code: int = None, stdout: str = None, stderr: str = None
+        self,
+        status_code: int = None,
+        stdout: str = None,
+        stderr: str = None,
+        stats: Optional[Dict[str, float]] = None,
+        stdout_truncated: bool = False,
+        stderr_truncated: bool = False,
     ) -> None:
         self.status_code = status_code
         self.stdout = stdout
         self.stderr = stderr
+        self.stats = stats
+        self.stdout_truncated = stdout_truncated
+        self.stderr_truncated = stderr_truncated
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "exit_code": self.status_code,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "stdout_truncated": self.stdout_truncated,
+            "stderr_truncated": self.stderr_truncated,
+            "stats": self.stats or {},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunResponse":
+        return cls(
+            status_code=data["exit_code"],
+            stdout=data["stdout"],
+            stderr=data["stderr"],
+            stats=data.get("stats"),
+            stdout_truncated=data.get("stdout_truncated", False),
+            stderr_truncated=data.get("stderr_truncated", False),
+        )
+
+
+def create_filestorages(raw_files: Any) -> Dict[str, "FileStorage"]:
+    if not isinstance(raw_files, dict):
+        raise IncorrectJSONError()
 
-def create_filestorage(filename: str, content: str) -> FileStorage:
-    bcontent = bytes(content, "utf-8")
+    files = {}
+    for filename, content in raw_files.items():
+        if not isinstance(filename, str) or not isinstance(
+            content, (str, bytes)
+        ):
+            raise IncorrectJSONError()
+        files[filename] = create_filestorage(filename, content)
+
+    return files
+
+
+def create_filestorage(
+    filename: str, content: Union[str, bytes]
+) -> "FileStorage":
+    from werkzeug.datastructures import FileStorage
+
+    bcontent = content if isinstance(content, bytes) else content.encode()
     return FileStorage(stream=BytesIO(bcontent), filename=filename)
+
+
+def read_file(file: "FileStorage") -> bytes:
+    position = file.stream.tell()
+    content = file.stream.read()
+    file.stream.seek(position)
+    return content
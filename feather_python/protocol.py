@@ -0,0 +1,59 @@
+"""
+Compact binary protocol for internal callers.
+
+Every message is a single frame: a 4-byte big-endian length followed by
+a msgpack document of that length. File contents and output streams are
+carried as msgpack bin/str values, so nothing has to be base64'd or
+round-tripped through JSON.
+"""
+import struct
+from typing import Any, BinaryIO
+
+from feather_python.errors import InvalidFrameError
+
+
+MSGPACK_MIMETYPE = "application/msgpack"
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 64 * 1024 * 1024  # bytes
+
+
+def pack(obj: Any) -> bytes:
+    import msgpack
+
+    return msgpack.packb(obj, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    import msgpack
+
+    try:
+        return msgpack.unpackb(data, raw=False)
+    except (ValueError, msgpack.UnpackException):
+        raise InvalidFrameError()
+
+
+def pack_frame(obj: Any) -> bytes:
+    payload = pack(obj)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def read_frame(stream: BinaryIO) -> Any:
+    header = read_exactly(stream, FRAME_HEADER.size)
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise InvalidFrameError()
+
+    return unpack(read_exactly(stream, length))
+
+
+def read_exactly(stream: BinaryIO, size: int) -> bytes:
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = stream.read(remaining)
+        if not chunk:
+            raise InvalidFrameError()
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
@@ -0,0 +1,139 @@
+"""
+Registry of the Python interpreters this service can run code with.
+
+Interpreters are declared once at startup, validated by running them, and
+their version metadata is cached so requests can be routed by name
+(e.g. "pypy") or by version (e.g. "3.11") without spawning anything.
+"""
+import json
+import logging
+import shlex
+import subprocess
+from typing import Dict, List, Optional
+
+from feather_python.errors import UnsupportedPythonVersionError
+
+
+logger = logging.getLogger(__name__)
+
+VERSION_PROBE = (
+    "import json, sys;"
+    " print(json.dumps({"
+    "'version': '%d.%d.%d' % sys.version_info[:3],"
+    " 'implementation': sys.implementation.name,"
+    " 'executable': sys.executable}))"
+)
+PROBE_TIMEOUT = 10  # seconds
+
+
+class Interpreter:
+    def __init__(
+        self,
+        name: str,
+        python_path: str,
+        flags: Optional[List[str]] = None,
+        version: Optional[str] = None,
+        implementation: Optional[str] = None,
+        executable: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.python_path = python_path
+        self.flags = flags or []
+        self.version = version
+        self.implementation = implementation
+        self.executable = executable
+
+    @property
+    def short_version(self) -> Optional[str]:
+        return self.version and ".".join(self.version.split(".")[:2])
+
+    @property
+    def ignores_environment(self) -> bool:
+        """Whether the flags make Python ignore PYTHON* variables."""
+        for flag in self.flags:
+            if not flag.startswith("-") or flag.startswith("--"):
+                continue
+            for option in flag[1:]:
+                if option in "IE":
+                    return True
+                if option in "WX":
+                    # the rest of the flag is this option's argument
+                    break
+
+        return False
+
+    def probe(self) -> "Interpreter":
+        proc = subprocess.run(
+            [self.python_path, "-c", VERSION_PROBE],
+            capture_output=True,
+            timeout=PROBE_TIMEOUT,
+            check=True,
+        )
+        metadata = json.loads(proc.stdout)
+
+        self.version = metadata["version"]
+        self.implementation = metadata["implementation"]
+        self.executable = metadata["executable"]
+        return self
+
+
+class RuntimeRegistry:
+    def __init__(self) -> None:
+        self.interpreters: Dict[str, Interpreter] = {}
+        self.default: Optional[Interpreter] = None
+
+    def register(self, interpreter: Interpreter) -> bool:
+        """
+        Probe the interpreter and make it available under its name and
+        its major.minor version. Returns False if it doesn't start.
+        """
+        try:
+            interpreter.probe()
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            logger.warning(
+                "Skipping Python interpreter %r (%s): %s",
+                interpreter.name,
+                interpreter.python_path,
+                e,
+            )
+            return False
+
+        self.interpreters.setdefault(interpreter.short_version, interpreter)
+        self.interpreters[interpreter.name] = interpreter
+        self.default = self.default or interpreter
+        return True
+
+    def get(self, name: Optional[str] = None) -> Interpreter:
+        interpreter = self.interpreters.get(name) if name else self.default
+        if interpreter is None:
+            raise UnsupportedPythonVersionError()
+
+        return interpreter
+
+    @classmethod
+    def from_config(
+        cls, config: str, default_python_path: str
+    ) -> "RuntimeRegistry":
+        """
+        `config` is a shell-quoted list of name=command assignments,
+        e.g. `3.10=python3.10 "pypy=pypy3 -X dev"`. The first one is the
+        default. Any flags after the executable are that interpreter's
+        launch profile. When `config` is empty, `default_python_path` is
+        the only interpreter.
+        """
+        assignments = config and shlex.split(config) or []
+        entries = [
+            assignment.split("=", maxsplit=1)
+            for assignment in assignments
+            if "=" in assignment
+        ] or [["default", default_python_path]]
+
+        registry = cls()
+        for name, command in entries:
+            python_path, *flags = shlex.split(command)
+            registry.register(Interpreter(name, python_path, flags=flags))
+
+        if registry.default is None:
+            raise RuntimeError("No usable Python interpreter was found")
+
+        return registry
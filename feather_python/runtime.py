@@ -1,20 +1,38 @@
 import contextlib
+import io
 import os
+import signal
 import subprocess
 import tempfile
+import threading
+import time
 
-from feather_python.errors import EntrypointNotFoundError, InvalidFilepathError
+from feather_python.errors import EntrypointNotFoundError, RunTimeoutError
 from feather_python.models import RunRequestMode, RunResponse
+from feather_python.workspace import WorkspacePlan
+
+
+KILL_GRACE_PERIOD = 1  # seconds, for killed processes to close their pipes
 
 
 class PythonRuntime:
     def __init__(
-        self, python_path, base_tempdir_path, default_entrypoint, timeout
+        self,
+        python_path,
+        base_tempdir_path,
+        default_entrypoint,
+        timeout,
+        python_flags=None,
+        base_env=None,
+        max_output_size=None,
     ):
         self.python_path = python_path
         self.base_tempdir_path = base_tempdir_path
         self.default_entrypoint = default_entrypoint
         self.timeout = timeout
+        self.python_flags = python_flags or []
+        self.base_env = base_env or {}
+        self.max_output_size = max_output_size
 
     def run(self, run_request: "RunRequest") -> RunResponse:
         entrypoint = run_request.entrypoint or self.default_entrypoint
@@ -24,60 +42,159 @@ class PythonRuntime:
         ):
             raise EntrypointNotFoundError
 
-        with self.setup_fs(run_request, entrypoint=entrypoint) as tempdir:
+        files = (
+            run_request.files
+            if run_request.mode == RunRequestMode.FILES
+            else {entrypoint: io.BytesIO(run_request.code.encode("utf-8"))}
+        )
+        # validate every path before anything is written
+        plan = WorkspacePlan.from_files(files)
+
+        with self.setup_fs(plan) as tempdir:
             command = self.get_command(
                 tempdir=tempdir,
                 entrypoint=run_request.entrypoint or self.default_entrypoint,
                 args=run_request.args or [],
             )
-            proc = subprocess.run(
-                command,
-                capture_output=True,
-                timeout=self.timeout,
-                env=run_request.env,
+            started_at = time.monotonic()
+            returncode, raw_stdout, raw_stderr, usage = run_process(
+                command, env=self.get_env(run_request), timeout=self.timeout
             )
+            wall_time = time.monotonic() - started_at
+
+        stdout, stdout_truncated = self.decode_output(raw_stdout)
+        stderr, stderr_truncated = self.decode_output(raw_stderr)
 
         return RunResponse(
-            status_code=proc.returncode,
-            stdout=proc.stdout.decode("utf-8"),
-            stderr=proc.stderr.decode("utf-8"),
+            status_code=returncode,
+            stdout=stdout,
+            stderr=stderr,
+            stats=get_stats(wall_time, usage),
+            stdout_truncated=stdout_truncated,
+            stderr_truncated=stderr_truncated,
         )
 
     def run_tests(self, test_request: "TestRequest") -> "TestResponse":
         pass
 
     @contextlib.contextmanager
-    def setup_fs(self, run_request: "RunRequest", entrypoint: str):
+    def setup_fs(self, plan: WorkspacePlan):
         with tempfile.TemporaryDirectory(
             dir=self.base_tempdir_path
         ) as tempdir:
-            if run_request.mode == RunRequestMode.FILES:
-                for filepath, file in run_request.files.items():
-                    final_filepath = os.path.join(tempdir, filepath)
-                    if not is_child(final_filepath, tempdir):
-                        raise InvalidFilepathError
-
-                    create_parent_dirs_if_not_exist(final_filepath)
-                    file.save(final_filepath)
-            else:
-                filepath = os.path.join(tempdir, entrypoint)
-                with open(filepath, "w") as f:
-                    f.write(run_request.code)
-
+            plan.create(tempdir)
             yield tempdir
 
+    def get_env(self, run_request: "RunRequest"):
+        if not self.base_env:
+            return run_request.env
+
+        return {**(run_request.env or {}), **self.base_env}
+
+    def decode_output(self, output: bytes):
+        if self.max_output_size is None or len(output) <= self.max_output_size:
+            return output.decode("utf-8"), False
+
+        # the cut may land inside a multi-byte character
+        truncated = output[: self.max_output_size]
+        return truncated.decode("utf-8", errors="ignore"), True
+
     def get_command(self, tempdir, entrypoint, args=None):
         entrypoint_path = os.path.join(tempdir, entrypoint)
-        command = [self.python_path, entrypoint_path] + (args or [])
+        command = (
+            [self.python_path]
+            + self.python_flags
+            + [entrypoint_path]
+            + (args or [])
+        )
         return command
 
 
-def is_child(child, parent):
-    abs_child = os.path.abspath(child)
-    abs_parent = os.path.abspath(parent)
-
-    return os.path.commonprefix([abs_child, abs_parent]) == abs_parent
+def run_process(command, env, timeout):
+    """
+    Like `subprocess.run(command, capture_output=True)`, but the child is
+    reaped with wait4, so its resource usage is its own rather than that
+    of every child of this process (job workers and threaded gunicorn
+    workers run several at once). Returns the exit code, stdout, stderr
+    and the child's rusage.
+
+    The child runs in a session of its own, and its whole process group
+    is killed once the run is over, so nothing it starts can hold the
+    output pipes (and the request) open past `timeout`.
+    """
+    deadline = time.monotonic() + timeout
+    proc = subprocess.Popen(
+        command,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=env,
+        start_new_session=True,
+    )
+    outputs = {}
+    readers = [
+        threading.Thread(
+            target=lambda name, stream: outputs.update({name: stream.read()}),
+            args=(name, stream),
+            daemon=True,
+        )
+        for name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr))
+    ]
+    for reader in readers:
+        reader.start()
+
+    lock = threading.Lock()
+    exited = False
+    timed_out = threading.Event()
+
+    def kill():
+        # until the child is reaped its pid can't be reused, so this can
+        # only ever signal the child's own group
+        with lock:
+            if not exited:
+                timed_out.set()
+                kill_process_group(proc.pid)
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    try:
+        os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+        with lock:
+            exited = True
+        _, status, usage = os.wait4(proc.pid, 0)
+    finally:
+        timer.cancel()
+
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # processes left behind by the child may still hold the pipes open
+    for reader in readers:
+        reader.join(max(0, deadline - time.monotonic()))
+    if any(reader.is_alive() for reader in readers):
+        timed_out.set()
+
+    # a live group member keeps the group id, and so the pid, from reuse
+    kill_process_group(proc.pid)
+    for reader in readers:
+        reader.join(KILL_GRACE_PERIOD)
+    if not any(reader.is_alive() for reader in readers):
+        proc.stdout.close()
+        proc.stderr.close()
+
+    if timed_out.is_set():
+        raise RunTimeoutError()
+
+    return proc.returncode, outputs["stdout"], outputs["stderr"], usage
+
+
+def kill_process_group(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
 
 
-def create_parent_dirs_if_not_exist(filepath):
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+def get_stats(wall_time, usage):
+    return {
+        "wall_time": wall_time,
+        "user_time": usage.ru_utime,
+        "system_time": usage.ru_stime,
+    }
@@ -0,0 +1,104 @@
+"""
+Cost-based timeouts and scheduling for runs.
+
+The cost model remembers the wall times of recent runs, keyed by exercise
+(or by the code's fingerprint when no exercise is given). A key with a
+track record of fast runs gets a tighter timeout, so runaway code stops
+holding a worker for the full limit. A run that hits a tightened timeout
+is recorded at that timeout, so the next run gets more time. A key whose
+typical (median) run is slow is "heavy" and runs in a small lane of its
+own, leaving the rest of the capacity to the interactive majority; one
+runaway submission doesn't make a whole exercise heavy.
+
+Like the single-flight cache, the model and the lane are per process, so
+they pay off with threaded gunicorn workers (`--threads`).
+"""
+import collections
+import statistics
+import threading
+from typing import Deque, Optional
+
+from feather_python.errors import NoWorkerAvailableError
+
+
+class CostModel:
+    def __init__(
+        self,
+        max_timeout: float,
+        heavy_threshold: float,
+        min_timeout: float = 2,
+        headroom: float = 4,
+        min_samples: int = 3,
+        window: int = 20,
+        max_keys: int = 10000,
+    ) -> None:
+        self.max_timeout = max_timeout
+        self.heavy_threshold = heavy_threshold
+        self.min_timeout = min_timeout
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._samples: "collections.OrderedDict[str, Deque[float]]" = (
+            collections.OrderedDict()
+        )
+
+    def record(self, key: str, wall_time: float) -> None:
+        """
+        Record a finished run. A run that timed out is recorded at its
+        timeout, a lower bound of its cost.
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = collections.deque(maxlen=self.window)
+                self._samples[key] = samples
+                if len(self._samples) > self.max_keys:
+                    self._samples.popitem(last=False)
+            else:
+                self._samples.move_to_end(key)
+            samples.append(wall_time)
+
+    def predict(self, key: str) -> Optional[float]:
+        """
+        The slowest of the recent runs for `key`, or None while there are
+        too few of them to go by.
+        """
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return None
+            return max(samples)
+
+    def get_timeout(self, key: str) -> float:
+        predicted = self.predict(key)
+        if predicted is None:
+            return self.max_timeout
+
+        timeout = max(self.min_timeout, predicted * self.headroom)
+        return min(self.max_timeout, timeout)
+
+    def is_heavy(self, key: str) -> bool:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None or len(samples) < self.min_samples:
+                return False
+            return statistics.median(samples) >= self.heavy_threshold
+
+
+class Lane:
+    """A bounded pool of run slots, like WorkerLoad but with a limit."""
+
+    def __init__(self, capacity: int, wait_timeout: float) -> None:
+        self.capacity = capacity
+        self.wait_timeout = wait_timeout
+        self._semaphore = threading.BoundedSemaphore(capacity)
+
+    def __enter__(self) -> "Lane":
+        if not self._semaphore.acquire(timeout=self.wait_timeout):
+            raise NoWorkerAvailableError()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._semaphore.release()
@@ -0,0 +1,238 @@
+"""
+Configuration and run execution shared by the Flask app and the lean
+WSGI handler in feather_python.wsgi.
+
+Nothing here imports Flask, and subsystems that are off by default (the
+dispatcher, the job queue) are only imported when they are configured,
+so this module is cheap to import on a cold start.
+"""
+import contextlib
+import functools
+import os
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from feather_python.environments import EnvironmentRegistry
+from feather_python.errors import BaseFeatherError, RunTimeoutError
+from feather_python.models import RunRequest, RunResponse
+from feather_python.protocol import pack, unpack
+from feather_python.registry import RuntimeRegistry
+from feather_python.runtime import PythonRuntime
+from feather_python.scheduling import CostModel, Lane
+from feather_python.singleflight import SingleFlight
+
+
+BASE_TEMPDIR_PATH = os.getenv("FEATHER_BASE_TEMPDIR_PATH", "/tmp/")
+DEFAULT_ENTRYPOINT = "main.py"
+PYTHON_EXECUTABLE_PATH = "python3"
+PYTHON_INTERPRETERS = os.getenv("FEATHER_PYTHON_INTERPRETERS", "")
+PYTHON_ENVIRONMENTS = os.getenv("FEATHER_PYTHON_ENVIRONMENTS", "")
+PRECOMPILE_ENVIRONMENTS = bool(os.getenv("FEATHER_PRECOMPILE_ENVIRONMENTS"))
+SUBPROCESS_TIMEOUT = 30  # seconds
+MAX_OUTPUT_SIZE = os.getenv("FEATHER_MAX_OUTPUT_SIZE")  # bytes per stream
+MAX_CONTENT_LENGTH = int(
+    os.getenv("FEATHER_MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+)  # bytes
+MAX_DECOMPRESSED_SIZE = int(
+    os.getenv("FEATHER_MAX_DECOMPRESSED_SIZE", MAX_CONTENT_LENGTH)
+)  # bytes
+COMPRESSION_MIN_SIZE = int(
+    os.getenv("FEATHER_COMPRESSION_MIN_SIZE", 1024)
+)  # bytes
+WORKER_URLS = os.getenv("FEATHER_WORKERS", "")
+WORKER_CAPACITY = int(
+    os.getenv("FEATHER_WORKER_CAPACITY", os.cpu_count() or 1)
+)
+DISPATCH_TIMEOUT_MARGIN = 5  # seconds, for workspace setup and transfer
+JOBS_DB_PATH = os.getenv("FEATHER_JOBS_DB")
+JOB_WORKERS = int(os.getenv("FEATHER_JOB_WORKERS", 1))
+ADAPTIVE_SCHEDULING = bool(os.getenv("FEATHER_ADAPTIVE_SCHEDULING"))
+HEAVY_RUN_THRESHOLD = float(
+    os.getenv("FEATHER_HEAVY_RUN_THRESHOLD", 5)
+)  # seconds
+HEAVY_CAPACITY = int(
+    os.getenv("FEATHER_HEAVY_CAPACITY", max(1, WORKER_CAPACITY // 4))
+)
+HEAVY_LANE_WAIT = 2  # seconds, before a run gets a 503 from a full lane
+# the longest a run can take from arrival to result; the single-flight,
+# dispatch and job lease limits all derive from it
+RUN_DEADLINE = HEAVY_LANE_WAIT + SUBPROCESS_TIMEOUT + DISPATCH_TIMEOUT_MARGIN
+
+
+class WorkerLoad:
+    """In-flight run counter that a worker advertises to dispatchers."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "WorkerLoad":
+        with self._lock:
+            self.inflight += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        with self._lock:
+            self.inflight -= 1
+
+    def has_capacity(self) -> bool:
+        return self.inflight < self.capacity
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"capacity": self.capacity, "inflight": self.inflight}
+
+
+environments = EnvironmentRegistry.from_config(PYTHON_ENVIRONMENTS)
+single_flight = SingleFlight()
+worker_load = WorkerLoad(capacity=WORKER_CAPACITY)
+dispatcher: Optional["Dispatcher"] = None
+job_queue: Optional["JobQueue"] = None
+cost_model: Optional[CostModel] = None
+heavy_lane = Lane(capacity=HEAVY_CAPACITY, wait_timeout=HEAVY_LANE_WAIT)
+if ADAPTIVE_SCHEDULING:
+    cost_model = CostModel(
+        max_timeout=SUBPROCESS_TIMEOUT, heavy_threshold=HEAVY_RUN_THRESHOLD
+    )
+
+_runtimes: Optional[RuntimeRegistry] = None
+_runtimes_lock = threading.Lock()
+_started = False
+_started_lock = threading.Lock()
+
+
+def get_runtimes() -> RuntimeRegistry:
+    """
+    The interpreter registry, probed on first use. `start` warms it in
+    the background, so requests rarely have to wait for the probe.
+    """
+    global _runtimes
+    with _runtimes_lock:
+        if _runtimes is None:
+            _runtimes = RuntimeRegistry.from_config(
+                PYTHON_INTERPRETERS,
+                default_python_path=PYTHON_EXECUTABLE_PATH,
+            )
+            if PRECOMPILE_ENVIRONMENTS:
+                environments.precompile(_runtimes)
+
+    return _runtimes
+
+
+def start() -> None:
+    """
+    Start the configured background subsystems, once per process.
+    """
+    global _started, dispatcher, job_queue
+    with _started_lock:
+        if _started:
+            return
+        _started = True
+
+    threading.Thread(target=get_runtimes, daemon=True).start()
+
+    if WORKER_URLS:
+        from feather_python.dispatcher import Dispatcher
+
+        dispatcher = Dispatcher(
+            WORKER_URLS.split(),
+            timeout=RUN_DEADLINE,
+        )
+        dispatcher.start()
+
+    if JOBS_DB_PATH:
+        from feather_python.jobs import JobQueue, JobWorker
+
+        job_queue = JobQueue(
+            JOBS_DB_PATH,
+            lease_duration=RUN_DEADLINE,
+        )
+        job_worker = JobWorker(
+            job_queue,
+            handler=run_job,
+            concurrency=JOB_WORKERS,
+            has_capacity=worker_load.has_capacity,
+        )
+        job_worker.start()
+
+
+def run(run_request: RunRequest) -> RunResponse:
+    execute = get_executor(run_request)
+    if run_request.deduplicate:
+        return single_flight.do(
+            get_run_key(run_request), execute, timeout=RUN_DEADLINE
+        )
+
+    return execute()
+
+
+def get_executor(run_request: RunRequest) -> Callable[[], RunResponse]:
+    if dispatcher is not None:
+        return functools.partial(dispatcher.dispatch, run_request)
+
+    interpreter = get_runtimes().get(run_request.python_version)
+    environment = environments.get(run_request.environment)
+    model = cost_model
+    cost_key = model and get_cost_key(run_request)
+    timeout = model.get_timeout(cost_key) if model else SUBPROCESS_TIMEOUT
+    lane = (
+        heavy_lane
+        if model and model.is_heavy(cost_key)
+        else contextlib.nullcontext()
+    )
+    runtime = PythonRuntime(
+        python_path=interpreter.python_path,
+        python_flags=interpreter.flags,
+        base_env=environment and environment.get_env(interpreter),
+        base_tempdir_path=BASE_TEMPDIR_PATH,
+        default_entrypoint=DEFAULT_ENTRYPOINT,
+        timeout=timeout,
+        max_output_size=MAX_OUTPUT_SIZE and int(MAX_OUTPUT_SIZE),
+    )
+
+    def execute():
+        with lane, worker_load:
+            try:
+                run_response = runtime.run(run_request)
+            except RunTimeoutError:
+                # the run took at least `timeout`; recording that as a
+                # lower bound loosens a timeout that was tightened too far
+                if model:
+                    model.record(cost_key, timeout)
+                raise
+
+        if model:
+            model.record(cost_key, run_response.stats["wall_time"])
+        return run_response
+
+    return execute
+
+
+def get_run_key(run_request: RunRequest) -> str:
+    """
+    The run's fingerprint, with its version resolved to an interpreter
+    when the run is local (workers resolve their own when dispatching).
+    """
+    if dispatcher is not None:
+        return run_request.fingerprint()
+
+    interpreter = get_runtimes().get(run_request.python_version)
+    return run_request.fingerprint(interpreter=interpreter.name)
+
+
+def get_cost_key(run_request: RunRequest) -> str:
+    if run_request.exercise:
+        return "exercise:" + run_request.exercise
+
+    return "code:" + get_run_key(run_request)
+
+
+def run_job(job: "Job") -> Tuple[bool, bytes]:
+    try:
+        run_request = RunRequest.from_payload(unpack(job.payload))
+        run_response = get_executor(run_request)()
+    except BaseFeatherError as e:
+        error = {"error": e.title, "message": e.message}
+        return False, pack(error)
+
+    return True, pack(run_response.to_dict())
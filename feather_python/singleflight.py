@@ -0,0 +1,55 @@
+"""
+Coalescing of identical in-flight runs.
+
+The first request for a key (the leader) runs; requests that arrive for
+the same key while it is running (followers) wait for it and get the
+same result. This works across the threads of one process, so it pays
+off with threaded gunicorn workers (`--threads`).
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from feather_python.errors import RunTimeoutError
+
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float) -> Any:
+        """
+        Run `fn` unless a call for `key` is already in flight, in which
+        case wait up to `timeout` seconds (the leader's own limit) for its
+        result. The leader's exceptions are re-raised in every follower.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            if not call.done.wait(timeout):
+                raise RunTimeoutError()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,174 @@
+"""
+Laying out a run's files inside its temporary workspace directory.
+
+The whole file map is validated up front (no absolute paths, no `..`,
+no file that is also a directory), then directories and files are
+created relative to directory file descriptors with O_NOFOLLOW, so no
+path can be redirected outside the workspace through a symlink.
+
+Multipart uploads are written to disk as UploadFiles while the request
+is parsed, and hard-linked into the workspace rather than copied.
+"""
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Dict, List, Tuple, Union
+
+from feather_python.errors import InvalidFilepathError
+
+
+DIR_FLAGS = os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW
+FILE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW
+FILE_MODE = 0o644
+
+
+class UploadFile(io.BufferedRandom):
+    """
+    A temporary file for an upload, created in `dir` (next to the
+    workspaces, so it can be linked into one) and removed when closed.
+    """
+
+    def __init__(self, dir: str) -> None:
+        fd, self.path = tempfile.mkstemp(dir=dir, prefix="upload-")
+        os.fchmod(fd, FILE_MODE)
+        super().__init__(io.FileIO(fd, "r+b"))
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.path)
+
+
+class WorkspacePlan:
+    def __init__(
+        self,
+        dirs: List[Tuple[str, ...]],
+        files: Dict[Tuple[str, ...], Union["FileStorage", BinaryIO]],
+    ) -> None:
+        # parents always come before their children in `dirs`
+        self.dirs = dirs
+        self.files = files
+
+    @classmethod
+    def from_files(
+        cls, files: Dict[str, Union["FileStorage", BinaryIO]]
+    ) -> "WorkspacePlan":
+        planned_files = {}
+        for filepath, file in files.items():
+            parts = split_path(filepath)
+            if parts in planned_files:
+                raise InvalidFilepathError()
+            planned_files[parts] = file
+
+        dirs = {
+            parts[:i]
+            for parts in planned_files
+            for i in range(1, len(parts))
+        }
+        if not dirs.isdisjoint(planned_files):
+            raise InvalidFilepathError()
+
+        return cls(dirs=sorted(dirs, key=len), files=planned_files)
+
+    def create(self, root: str) -> None:
+        dir_fds = {(): os.open(root, DIR_FLAGS)}
+        try:
+            for parts in self.dirs:
+                parent_fd, name = dir_fds[parts[:-1]], parts[-1]
+                os.mkdir(name, dir_fd=parent_fd)
+                dir_fds[parts] = os.open(name, DIR_FLAGS, dir_fd=parent_fd)
+
+            for parts, file in self.files.items():
+                parent_fd, name = dir_fds[parts[:-1]], parts[-1]
+                if link_file(file, name, parent_fd):
+                    continue
+                fd = os.open(name, FILE_FLAGS, FILE_MODE, dir_fd=parent_fd)
+                with os.fdopen(fd, "wb") as dst:
+                    save_file(file, dst)
+        finally:
+            for fd in dir_fds.values():
+                os.close(fd)
+
+
+def split_path(filepath: str) -> Tuple[str, ...]:
+    """
+    Split a relative POSIX filepath into its components, dropping empty
+    and `.` ones. Absolute paths and `..` are rejected, rather than
+    resolved, so a path can never point outside the workspace.
+    """
+    if "\0" in filepath or filepath.startswith("/"):
+        raise InvalidFilepathError()
+
+    parts = tuple(
+        part for part in filepath.split("/") if part not in ("", ".")
+    )
+    if not parts or ".." in parts:
+        raise InvalidFilepathError()
+
+    return parts
+
+
+def link_file(
+    file: Union["FileStorage", BinaryIO], name: str, dir_fd: int
+) -> bool:
+    """
+    Hard-link an UploadFile into place. Returns False, so the caller
+    copies it instead, for any other stream or when the link fails (for
+    example across filesystems).
+    """
+    stream = getattr(file, "stream", file)
+    if not isinstance(stream, UploadFile) or stream.tell() != 0:
+        return False
+
+    stream.flush()
+    try:
+        # like O_EXCL, linking never replaces or follows an existing name
+        os.link(stream.path, name, dst_dir_fd=dir_fd)
+    except OSError:
+        return False
+
+    return True
+
+
+def save_file(file: Union["FileStorage", BinaryIO], dst: BinaryIO) -> None:
+    """
+    Copy an upload (or any binary stream) into `dst`. In-memory buffers
+    are written straight from their memory and real files, such as
+    UploadFiles that couldn't be linked, are copied with sendfile;
+    anything else falls back to a chunked copy.
+    """
+    stream = getattr(file, "stream", file)
+    if isinstance(stream, io.BytesIO):
+        with stream.getbuffer() as buffer:
+            dst.write(buffer[stream.tell() :])
+        return
+
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        # its fileno() would roll an in-memory spool over to disk
+        shutil.copyfileobj(stream, dst)
+        return
+
+    try:
+        sendfile(stream, dst)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        dst.seek(0)
+        dst.truncate()
+        shutil.copyfileobj(stream, dst)
+
+
+def sendfile(src, dst) -> None:
+    src_fd = src.fileno()
+    offset = src.tell()
+    remaining = os.fstat(src_fd).st_size - offset
+    while remaining > 0:
+        sent = os.sendfile(dst.fileno(), src_fd, offset, remaining)
+        if sent == 0:
+            break
+        offset += sent
+        remaining -= sent
+
+    src.seek(offset)
@@ -0,0 +1,141 @@
+"""
+Lean WSGI entry point for cold starts.
+
+Plain-text code runs (the hot endpoint) are served straight from the
+WSGI environ, without importing Flask or werkzeug. Everything else is
+handed to the Flask app, which is only imported on first use.
+
+    gunicorn feather_python.wsgi:application
+"""
+import json
+from http import HTTPStatus
+
+from feather_python import service
+from feather_python.compression import (
+    choose_encoding,
+    compress_chunks,
+    parse_accept_qualities,
+)
+from feather_python.errors import BaseFeatherError, CodeNotFoundError
+from feather_python.models import RunRequest
+
+
+HOT_PATH = "/runtimes/python"
+HOT_MIMETYPES = ("", "text/plain", "text/python")
+STRUCTURED_MIMETYPES = ("application/json", "application/msgpack")
+TEXT_CONTENT_TYPE = "text/html; charset=utf-8"  # what Flask sends for str
+JSON_CONTENT_TYPE = "application/json"
+
+_flask_app = None
+
+
+def application(environ, start_response):
+    if not is_hot_request(environ):
+        return get_flask_app()(environ, start_response)
+
+    headers = get_request_headers(environ)
+    try:
+        run_request = RunRequest.from_headers(headers, code=read_code(environ))
+        run_response = service.run(run_request)
+    except BaseFeatherError as e:
+        error = {"error": e.title, "message": e.message}
+        # formatted like Flask's jsonify
+        body = json.dumps(error, separators=(",", ":"), sort_keys=True) + "\n"
+        return respond(
+            environ,
+            start_response,
+            f"{e.status_code} {HTTPStatus(e.status_code).phrase}",
+            JSON_CONTENT_TYPE,
+            body,
+        )
+
+    body = (
+        run_response.stdout
+        if run_response.status_code == 0
+        else run_response.stderr
+    )
+    return respond(environ, start_response, "200 OK", TEXT_CONTENT_TYPE, body)
+
+
+def is_hot_request(environ) -> bool:
+    """
+    Only requests whose response doesn't depend on anything the Flask
+    app adds on top (content negotiation, decompression, size limits)
+    take the lean path.
+    """
+    if environ["REQUEST_METHOD"] != "POST":
+        return False
+    if environ.get("PATH_INFO") != HOT_PATH:
+        return False
+
+    mimetype = environ.get("CONTENT_TYPE", "").split(";")[0].strip().lower()
+    if mimetype not in HOT_MIMETYPES:
+        return False
+
+    content_length = environ.get("CONTENT_LENGTH", "")
+    if not content_length.isdigit() or environ.get("HTTP_CONTENT_ENCODING"):
+        return False
+    if int(content_length) > service.MAX_CONTENT_LENGTH:
+        return False
+
+    # same rule as the app's `accepts`: exact matches with a quality above 0
+    qualities = parse_accept_qualities(environ.get("HTTP_ACCEPT", ""))
+    return not any(
+        qualities.get(mimetype, 0) > 0 for mimetype in STRUCTURED_MIMETYPES
+    )
+
+
+def get_request_headers(environ):
+    return {
+        key[5:].replace("_", "-").lower(): value
+        for key, value in environ.items()
+        if key.startswith("HTTP_")
+    }
+
+
+def read_code(environ) -> str:
+    content_length = int(environ["CONTENT_LENGTH"])
+    code = environ["wsgi.input"].read(content_length).decode("utf-8")
+    if not code:
+        raise CodeNotFoundError()
+
+    return code
+
+
+def respond(environ, start_response, status, content_type, body: str):
+    data = body.encode("utf-8")
+    headers = [("Content-Type", content_type)] + get_cors_headers(environ)
+
+    encoding = choose_encoding(environ.get("HTTP_ACCEPT_ENCODING", ""))
+    if encoding and len(data) >= service.COMPRESSION_MIN_SIZE:
+        headers.append(("Content-Encoding", encoding))
+        headers.append(("Vary", "Accept-Encoding"))
+        start_response(status, headers)
+        return compress_chunks([data], encoding)
+
+    headers.append(("Content-Length", str(len(data))))
+    start_response(status, headers)
+    return [data]
+
+
+def get_cors_headers(environ):
+    # what flask_cors sends with the app's allow-any-origin configuration:
+    # the request's origin echoed back, or `*` when there is none
+    origin = environ.get("HTTP_ORIGIN")
+    if origin is None:
+        return [("Access-Control-Allow-Origin", "*")]
+
+    return [("Access-Control-Allow-Origin", origin), ("Vary", "Origin")]
+
+
+def get_flask_app():
+    global _flask_app
+    if _flask_app is None:
+        from feather_python.app import app
+
+        _flask_app = app
+
+    return _flask_app
+
+
+service.start()
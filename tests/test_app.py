@@ -1,7 +1,15 @@
 import textwrap
+import threading
+import time
 from collections import namedtuple
 from io import BytesIO
 
+import pytest
+
+from feather_python import service
+from feather_python.models import RunRequest
+from feather_python.protocol import MSGPACK_MIMETYPE, pack_frame, read_frame
+from feather_python.scheduling import CostModel, Lane
 from tests.conftest import get_run_endpoint
 
 endpoint = get_run_endpoint()
@@ -134,6 +142,194 @@ def test_run_with_code_with_env(client):
     assert response.text == expected_output
 
 
+def test_run_with_json_response(client):
+    fake_data = get_fake_data_with_code_that_errors()
+
+    response = client.post(
+        endpoint,
+        headers={"Accept": "application/json"},
+        data="print('some output')\n" + fake_data.code,
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert response.json["exit_code"] == 1
+    assert response.json["stdout"] == "some output\n"
+    assert fake_data.expected_in_output in response.json["stderr"]
+    assert response.json["stdout_truncated"] is False
+    assert response.json["stderr_truncated"] is False
+    assert response.json["stats"]["wall_time"] > 0
+    assert response.json["stats"]["user_time"] >= 0
+
+
+@pytest.mark.parametrize(
+    "accept",
+    ["application/json;q=0, text/plain", "*/*", "text/html, */*;q=0.8"],
+)
+def test_run_with_plain_text_response_unless_json_is_accepted(
+    client, accept
+):
+    response = client.post(
+        endpoint, headers={"Accept": accept}, data="print('hi')"
+    )
+
+    assert response.status_code == 200
+    assert response.text == "hi\n"
+
+
+def test_run_stats_are_not_mixed_with_concurrent_runs(client):
+    busy_code = textwrap.dedent(
+        """
+        import time
+        started_at = time.process_time()
+        while time.process_time() - started_at < 1:
+            pass
+        """
+    )
+    responses = {}
+
+    def post(name, code):
+        responses[name] = client.post(
+            endpoint, headers={"Accept": "application/json"}, data=code
+        )
+
+    threads = [
+        threading.Thread(target=post, args=("busy", busy_code)),
+        threading.Thread(
+            target=post, args=("idle", "import time; time.sleep(1.5)")
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    def cpu_time(response):
+        stats = response.json["stats"]
+        return stats["user_time"] + stats["system_time"]
+
+    assert cpu_time(responses["busy"]) >= 0.9
+    assert cpu_time(responses["idle"]) < 0.5
+
+
+def test_run_with_truncated_output(client, monkeypatch):
+    monkeypatch.setattr(service, "MAX_OUTPUT_SIZE", "10")
+
+    response = client.post(
+        endpoint,
+        headers={"Accept": "application/json"},
+        data="print('ä' * 100)",
+    )
+
+    assert response.status_code == 200
+    assert response.json["stdout"] == "ä" * 5
+    assert response.json["stdout_truncated"] is True
+    assert response.json["stderr_truncated"] is False
+
+
+def test_run_with_python_version_in_path(client):
+    code = "import sys; print('%d.%d' % sys.version_info[:2])"
+    version = service.get_runtimes().get().short_version
+
+    response = client.post(f"{endpoint}/v/{version}", data=code)
+
+    assert response.status_code == 200
+    assert response.text == f"{version}\n"
+
+
+def test_fixed_paths_are_not_python_versions(client):
+    assert client.post(f"{endpoint}/capacity").status_code == 405
+    assert client.get(f"{endpoint}/jobs").status_code == 405
+
+
+def test_run_with_deduplicate_shares_one_run(client):
+    code = "import time; time.sleep(0.5); print(time.time_ns())"
+    outputs = []
+
+    def post():
+        response = client.post(
+            endpoint, headers={"x-feather-deduplicate": "1"}, data=code
+        )
+        outputs.append(response.text)
+
+    threads = [threading.Thread(target=post) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(outputs) == 4
+    assert len(set(outputs)) == 1
+
+
+def test_run_with_deduplicate_shares_one_run_across_version_aliases(client):
+    code = "import time; time.sleep(0.5); print(time.time_ns())"
+    version = service.get_runtimes().get().short_version
+    outputs = []
+
+    def post(headers):
+        response = client.post(
+            endpoint,
+            headers={"x-feather-deduplicate": "1", **headers},
+            data=code,
+        )
+        outputs.append(response.text)
+
+    # the default interpreter, requested implicitly and by its version
+    threads = [
+        threading.Thread(target=post, args=({},)),
+        threading.Thread(
+            target=post, args=({"x-feather-python-version": version},)
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(outputs) == 2
+    assert len(set(outputs)) == 1
+
+
+def test_run_with_adaptive_timeout_stops_runaway_code(client, monkeypatch):
+    cost_model = CostModel(
+        max_timeout=30, heavy_threshold=5, min_timeout=0.5, min_samples=2
+    )
+    monkeypatch.setattr(service, "cost_model", cost_model)
+    headers = {"x-feather-exercise": "hello"}
+
+    for _ in range(2):
+        response = client.post(endpoint, headers=headers, data="print(1)")
+        assert response.status_code == 200
+
+    started_at = time.monotonic()
+    response = client.post(endpoint, headers=headers, data="while True: 0")
+
+    assert response.status_code == 504
+    assert response.json["error"] == "Run timed out"
+    assert time.monotonic() - started_at < 5
+
+
+def test_run_with_heavy_history_uses_heavy_lane(client, monkeypatch):
+    cost_model = CostModel(max_timeout=30, heavy_threshold=5)
+    for _ in range(3):
+        cost_model.record("exercise:slow", 10)
+    monkeypatch.setattr(service, "cost_model", cost_model)
+    monkeypatch.setattr(service, "heavy_lane", Lane(1, wait_timeout=0))
+
+    with service.heavy_lane:
+        response = client.post(
+            endpoint, headers={"x-feather-exercise": "slow"}, data="print(1)"
+        )
+        assert response.status_code == 503
+
+        # the interactive majority isn't held up by the heavy lane
+        response = client.post(
+            endpoint, headers={"x-feather-exercise": "fast"}, data="print(1)"
+        )
+        assert response.status_code == 200
+
+
 def test_run_with_multiple_files_with_explicit_entrypoint(client):
     fake_data = get_fake_data_with_multiple_files()
     files = fake_data.files
@@ -153,6 +349,80 @@ def test_run_with_multiple_files_with_explicit_entrypoint(client):
     assert response.text == expected_output
 
 
+def test_run_with_large_file_as_multipart(client):
+    content = b"x" * (2 * 1024 * 1024)
+    code = textwrap.dedent(
+        """
+    import os
+
+    path = os.path.join(os.path.dirname(__file__), "data.txt")
+    print(len(open(path, "rb").read()), os.stat(path).st_nlink)
+    """
+    ).encode("utf-8")
+
+    data = {
+        "main.py": (BytesIO(code), "main.py"),
+        "data.txt": (BytesIO(content), "data.txt"),
+    }
+
+    response = client.post(endpoint, data=data)
+
+    # the upload was hard-linked into the workspace, not copied
+    assert response.status_code == 200
+    assert response.text == f"{len(content)} 2\n"
+
+
+def test_run_with_multiple_files_as_msgpack(client):
+    fake_data = get_fake_data_with_multiple_files()
+    files = {
+        filename: content.encode("utf-8")
+        for filename, content in fake_data.files.items()
+    }
+
+    response = client.post(
+        endpoint,
+        headers={"Content-Type": MSGPACK_MIMETYPE},
+        data=pack_frame({"files": files}),
+    )
+
+    assert response.status_code == 200
+    assert response.text == fake_data.expected_output
+
+
+def test_run_with_msgpack_response(client):
+    fake_data = get_fake_data_with_code_that_errors()
+
+    response = client.post(
+        endpoint,
+        headers={"Accept": MSGPACK_MIMETYPE},
+        data=fake_data.code,
+    )
+
+    assert response.status_code == 200
+    assert response.mimetype == MSGPACK_MIMETYPE
+
+    frame = read_frame(BytesIO(response.data))
+    assert frame["exit_code"] == 1
+    assert frame["stdout"] == ""
+    assert fake_data.expected_in_output in frame["stderr"]
+    assert frame["stats"]["wall_time"] > 0
+
+
+def test_cors_preflight_allows_every_run_header(client):
+    for header in RunRequest.get_header_names():
+        response = client.options(
+            endpoint,
+            headers={
+                "Origin": "https://example.com",
+                "Access-Control-Request-Method": "POST",
+                "Access-Control-Request-Headers": header,
+            },
+        )
+
+        allowed = response.headers.get("Access-Control-Allow-Headers", "")
+        assert header in allowed.lower()
+
+
 def get_fake_data_with_multiple_files():
     files = {
         "code.py": textwrap.dedent(
@@ -265,3 +535,4 @@ def get_fake_data_with_code_with_env():
     expected_output = "Apple\nBall\n"
 
     return FakeCodeDataWithArgs(code, env, expected_output)
+
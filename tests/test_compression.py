@@ -0,0 +1,120 @@
+import gzip
+import json
+
+import pytest
+
+from tests.conftest import get_run_endpoint
+
+endpoint = get_run_endpoint()
+
+
+def get_codec(encoding):
+    """(compress, decompress) for `encoding`; zstd tests need zstandard."""
+    if encoding == "gzip":
+        return gzip.compress, gzip.decompress
+
+    zstandard = pytest.importorskip("zstandard")
+
+    def decompress(data):
+        # streamed frames don't record their size, so read them as a stream
+        return zstandard.ZstdDecompressor().stream_reader(data).read()
+
+    return zstandard.ZstdCompressor().compress, decompress
+
+
+def get_files_payload():
+    files = {
+        "main.py": "from code import code; code()",
+        "code.py": "def code(): print('hi from code.py')",
+    }
+    return json.dumps({"files": files}).encode("utf-8")
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_run_with_compressed_json(client, encoding):
+    compress, _ = get_codec(encoding)
+    response = client.post(
+        endpoint,
+        headers={
+            "Content-Type": "application/json",
+            "Content-Encoding": encoding,
+        },
+        data=compress(get_files_payload()),
+    )
+
+    assert response.status_code == 200
+    assert response.text == "hi from code.py\n"
+
+
+def test_run_with_compressed_code(client):
+    response = client.post(
+        endpoint,
+        headers={"Content-Encoding": "gzip"},
+        data=gzip.compress(b"print('hello, world!')"),
+    )
+
+    assert response.status_code == 200
+    assert response.text == "hello, world!\n"
+
+
+def test_decompressed_size_is_limited(app, client, monkeypatch):
+    middleware = app.wsgi_app.wsgi_app
+    monkeypatch.setattr(middleware, "max_size", 1024)
+
+    response = client.post(
+        endpoint,
+        headers={"Content-Encoding": "gzip"},
+        data=gzip.compress(b"#" * (1024 * 1024)),
+    )
+
+    assert response.status_code == 413
+    assert response.json["error"] == "Payload too large"
+
+
+def test_invalid_compressed_body(client):
+    response = client.post(
+        endpoint,
+        headers={"Content-Encoding": "gzip"},
+        data=b"this isn't gzip",
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Invalid compressed body"
+
+
+def test_unsupported_content_encoding(client):
+    response = client.post(
+        endpoint,
+        headers={"Content-Encoding": "br"},
+        data=b"print('hello, world!')",
+    )
+
+    assert response.status_code == 415
+    assert response.json["error"] == "Unsupported content encoding"
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_large_response_is_compressed(client, encoding):
+    _, decompress = get_codec(encoding)
+    response = client.post(
+        endpoint,
+        headers={"Accept-Encoding": encoding},
+        data="print('x' * 100000)",
+    )
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == encoding
+    assert "Content-Length" not in response.headers
+    assert decompress(response.data) == b"x" * 100000 + b"\n"
+
+
+def test_small_response_is_not_compressed(client):
+    response = client.post(
+        endpoint,
+        headers={"Accept-Encoding": "gzip"},
+        data="print('hello, world!')",
+    )
+
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "hello, world!\n"
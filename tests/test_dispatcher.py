@@ -0,0 +1,255 @@
+import socket
+import threading
+
+import pytest
+from flask import request
+from werkzeug.serving import make_server
+
+from feather_python import service
+from feather_python.dispatcher import Dispatcher, Worker
+from feather_python.errors import (
+    NoWorkerAvailableError,
+    RemoteFeatherError,
+    RunTimeoutError,
+    UnsupportedPythonVersionError,
+)
+from feather_python.models import RunRequest
+
+
+@pytest.fixture()
+def workers(app):
+    servers = [make_server("127.0.0.1", 0, app, threaded=True) for _ in "ab"]
+    threads = [
+        threading.Thread(target=server.serve_forever) for server in servers
+    ]
+    for thread in threads:
+        thread.start()
+
+    yield [f"http://127.0.0.1:{server.server_port}" for server in servers]
+
+    for server in servers:
+        server.shutdown()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.fixture()
+def dead_worker():
+    # bind and close, so that nothing is listening on the port
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture()
+def hung_worker():
+    # the kernel accepts connections on a listening socket, but nothing
+    # ever reads the request or replies
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def serve_stub(status, body):
+    def application(environ, start_response):
+        start_response(status, [("Content-Type", "application/json")])
+        return [body]
+
+    server = make_server("127.0.0.1", 0, application, threaded=True)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_port}"
+
+    server.shutdown()
+    thread.join()
+
+
+@pytest.fixture()
+def busy_worker():
+    body = b'{"error": "No worker available", "message": "Busy."}'
+    yield from serve_stub("503 Service Unavailable", body)
+
+
+@pytest.fixture()
+def not_a_worker():
+    # answers 200, but isn't a runtime worker
+    yield from serve_stub("200 OK", b'{"status": "ok"}')
+
+
+def get_run_request(app, **kwargs):
+    with app.test_request_context("/runtimes/python", method="POST", **kwargs):
+        return RunRequest.from_request(request)
+
+
+def test_dispatch_runs_code_on_a_worker(app, workers):
+    dispatcher = Dispatcher(workers, timeout=10)
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    run_response = dispatcher.dispatch(run_request)
+
+    assert run_response.status_code == 0
+    assert run_response.stdout == "hello, world!\n"
+
+
+def test_dispatch_forwards_files(app, workers):
+    dispatcher = Dispatcher(workers, timeout=10)
+    files = {
+        "main.py": "from code import code; code()",
+        "code.py": "def code(): print('hi from code.py')",
+    }
+    run_request = get_run_request(app, json={"files": files})
+
+    run_response = dispatcher.dispatch(run_request)
+
+    assert run_response.stdout == "hi from code.py\n"
+
+
+def test_dispatch_retries_on_another_worker(app, workers, dead_worker):
+    dispatcher = Dispatcher([dead_worker] + workers, timeout=10)
+    dead = dispatcher.workers[0]
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    run_response = dispatcher.dispatch(run_request)
+
+    assert run_response.stdout == "hello, world!\n"
+    assert not dead.healthy
+    assert all(worker.inflight == 0 for worker in dispatcher.workers)
+
+
+def test_dispatch_without_healthy_workers(app, dead_worker):
+    dispatcher = Dispatcher([dead_worker], timeout=10)
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    with pytest.raises(NoWorkerAvailableError):
+        dispatcher.dispatch(run_request)
+
+
+def test_dispatch_relays_worker_errors(app, workers):
+    dispatcher = Dispatcher(workers, timeout=10)
+    run_request = get_run_request(
+        app, json={"files": {"not_main.py": "print('hello, world!')"}}
+    )
+
+    with pytest.raises(RemoteFeatherError) as exc_info:
+        dispatcher.dispatch(run_request)
+
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.title == "Entrypoint not found"
+
+
+def test_health_check_reads_capacity(workers, dead_worker):
+    dispatcher = Dispatcher(workers + [dead_worker], timeout=10)
+
+    dispatcher.check_health()
+
+    healthy, _, dead = dispatcher.workers
+    assert healthy.healthy and healthy.capacity >= 1
+    assert not dead.healthy
+
+
+def test_health_check_marks_non_workers_unhealthy(workers, not_a_worker):
+    dispatcher = Dispatcher(workers + [not_a_worker], timeout=10)
+
+    dispatcher.check_health()
+
+    assert [worker.healthy for worker in dispatcher.workers] == [
+        True,
+        True,
+        False,
+    ]
+
+
+def test_health_check_reads_python_versions(app, workers):
+    dispatcher = Dispatcher(workers, timeout=10)
+
+    dispatcher.check_health()
+
+    version = service.get_runtimes().get().short_version
+    assert version in dispatcher.workers[0].python_versions
+
+
+def test_acquire_picks_worker_with_python_version():
+    dispatcher = Dispatcher(["http://a", "http://b"], timeout=10)
+    a, b = dispatcher.workers
+    a.python_versions, b.python_versions = {"3.10"}, {"3.10", "3.11"}
+    b.inflight = 5
+
+    assert dispatcher.acquire(exclude=[], python_version="3.11") is b
+    assert dispatcher.acquire(exclude=[], python_version="3.10") is a
+    assert dispatcher.acquire(exclude=[b], python_version="3.11") is None
+
+
+def test_dispatch_rejects_python_version_no_worker_has(app, workers):
+    dispatcher = Dispatcher(workers, timeout=10)
+    dispatcher.check_health()
+    run_request = get_run_request(
+        app, data="print(1)", headers={"x-feather-python-version": "0.1"}
+    )
+
+    with pytest.raises(UnsupportedPythonVersionError):
+        dispatcher.dispatch(run_request)
+
+
+def test_acquire_picks_least_loaded_worker():
+    dispatcher = Dispatcher(["http://a", "http://b", "http://c"], timeout=10)
+    a, b, c = dispatcher.workers
+    a.capacity, a.inflight = 4, 2
+    b.capacity, b.inflight = 4, 1
+    c.capacity, c.inflight = 1, 0
+    c.healthy = False
+
+    assert dispatcher.acquire(exclude=[]) is b
+    assert b.inflight == 2
+    assert dispatcher.acquire(exclude=[b]) is a
+
+
+def test_worker_load_uses_remote_inflight():
+    worker = Worker("http://a", capacity=2)
+    worker.remote_inflight = 2
+
+    assert worker.load == 1
+
+
+def test_dispatch_times_out_on_hung_worker_without_retrying(
+    app, workers, hung_worker
+):
+    dispatcher = Dispatcher([hung_worker] + workers, timeout=0.5)
+    # make the hung worker the least loaded one, so it is picked first
+    for worker in dispatcher.workers[1:]:
+        worker.remote_inflight = 1
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    with pytest.raises(RunTimeoutError):
+        dispatcher.dispatch(run_request)
+
+    assert dispatcher.workers[0].healthy is False
+    assert all(worker.healthy for worker in dispatcher.workers[1:])
+
+
+def test_dispatch_retries_busy_worker_without_marking_it_unhealthy(
+    app, workers, busy_worker
+):
+    dispatcher = Dispatcher([busy_worker] + workers, timeout=10)
+    # make the busy worker the least loaded one, so it is picked first
+    for worker in dispatcher.workers[1:]:
+        worker.remote_inflight = 1
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    run_response = dispatcher.dispatch(run_request)
+
+    assert run_response.stdout == "hello, world!\n"
+    assert all(worker.healthy for worker in dispatcher.workers)
+
+
+def test_dispatch_fails_when_every_worker_is_busy(app, busy_worker):
+    dispatcher = Dispatcher([busy_worker], timeout=10)
+    run_request = get_run_request(app, data="print('hello, world!')")
+
+    with pytest.raises(NoWorkerAvailableError):
+        dispatcher.dispatch(run_request)
+
+    assert dispatcher.workers[0].healthy is True
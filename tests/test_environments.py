@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+from feather_python import service
+from feather_python.environments import Environment, EnvironmentRegistry
+from feather_python.errors import (
+    IncompatibleEnvironmentError,
+    UnknownEnvironmentError,
+)
+from feather_python.registry import Interpreter
+
+
+@pytest.fixture()
+def interpreter():
+    return Interpreter("current", sys.executable).probe()
+
+
+@pytest.fixture()
+def layer(tmp_path):
+    (tmp_path / "greeting.py").write_text("GREETING = 'hi from layer'\n")
+    return tmp_path
+
+
+def test_environment_registry_from_config(layer):
+    registry = EnvironmentRegistry.from_config(f"data={layer} ml=/opt/ml")
+
+    assert registry.get("data").path == str(layer)
+    assert registry.get("ml").path == "/opt/ml"
+    assert registry.get(None) is None
+
+    with pytest.raises(UnknownEnvironmentError):
+        registry.get("does-not-exist")
+
+
+def test_environment_env_puts_layer_on_pythonpath(layer, interpreter):
+    env = Environment("data", str(layer)).get_env(interpreter)
+
+    assert env["PYTHONPATH"] == str(layer)
+    assert env["PYTHONDONTWRITEBYTECODE"] == "1"
+
+
+@pytest.mark.parametrize(
+    "flags, ignores_environment",
+    [
+        ([], False),
+        (["-s", "-B"], False),
+        (["-X", "importtime"], False),
+        (["-Werror"], False),
+        (["-I"], True),
+        (["-E"], True),
+        (["-sE"], True),
+    ],
+)
+def test_interpreter_ignores_environment(flags, ignores_environment):
+    interpreter = Interpreter("current", sys.executable, flags=flags)
+
+    assert interpreter.ignores_environment is ignores_environment
+
+
+def test_environment_rejects_isolated_interpreter(layer):
+    interpreter = Interpreter("isolated", sys.executable, flags=["-I"])
+
+    with pytest.raises(IncompatibleEnvironmentError):
+        Environment("data", str(layer)).get_env(interpreter)
+
+
+def test_environment_prefers_versioned_site_dir(layer, interpreter):
+    versioned_dir = layer / interpreter.short_version
+    versioned_dir.mkdir()
+
+    environment = Environment("data", str(layer))
+
+    assert environment.site_dir(interpreter) == str(versioned_dir)
+
+
+def test_environment_precompile_writes_bytecode(layer, interpreter):
+    Environment("data", str(layer)).precompile(interpreter)
+
+    cached = os.listdir(layer / "__pycache__")
+    assert any(name.startswith("greeting.") for name in cached)
+
+
+def test_run_with_environment(client, monkeypatch, layer):
+    monkeypatch.setattr(
+        service,
+        "environments",
+        EnvironmentRegistry.from_config(f"data={layer}"),
+    )
+
+    response = client.post(
+        "/runtimes/python",
+        headers={"x-feather-environment": "data"},
+        data="from greeting import GREETING; print(GREETING)",
+    )
+
+    assert response.status_code == 200
+    assert response.text == "hi from layer\n"
@@ -1,5 +1,8 @@
 from io import BytesIO
 
+import pytest
+
+from feather_python.protocol import MSGPACK_MIMETYPE, pack_frame
 from tests.conftest import get_run_endpoint
 
 
@@ -151,3 +154,100 @@ def test_invalid_filepath_error_when_filepath_is_at_root(client):
     assert "error" in response.json
     assert "message" in response.json
     assert response.json["error"] == "Invalid filepath"
+
+
+def test_invalid_frame_error_when_frame_is_truncated(client):
+    response = client.post(
+        endpoint,
+        headers={"Content-Type": MSGPACK_MIMETYPE},
+        data=b"\x00\x00\x00\x10\x81",
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json
+    assert "message" in response.json
+    assert response.json["error"] == "Invalid frame"
+
+
+def test_unsupported_python_version_error(client):
+    response = client.post(
+        endpoint,
+        headers={"x-feather-python-version": "1.0"},
+        data="print('hello, world!')",
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json
+    assert "message" in response.json
+    assert response.json["error"] == "Unsupported Python version"
+
+
+def test_unknown_environment_error(client):
+    response = client.post(
+        endpoint,
+        headers={"x-feather-environment": "does-not-exist"},
+        data="print('hello, world!')",
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json
+    assert "message" in response.json
+    assert response.json["error"] == "Unknown environment"
+
+
+def test_job_queue_disabled_error(client):
+    response = client.post(
+        "/runtimes/python/jobs", data="print('hello, world!')"
+    )
+
+    assert response.status_code == 501
+    assert "error" in response.json
+    assert "message" in response.json
+    assert response.json["error"] == "Job queue disabled"
+
+
+def test_invalid_filepath_error_when_entrypoint_is_outside(client):
+    response = client.post(
+        endpoint,
+        headers={"x-feather-entrypoint": "../main.py"},
+        data="print('hello, world!')",
+    )
+
+    assert response.status_code == 400
+    assert "error" in response.json
+    assert "message" in response.json
+    assert response.json["error"] == "Invalid filepath"
+
+
+@pytest.mark.parametrize(
+    "frame",
+    [
+        {"files": {"main.py": 5}},
+        {"files": ["main.py"]},
+        {"code": 5},
+        {"code": "print(1)", "args": "foo"},
+        {"code": "print(1)", "args": ["foo", 1]},
+        {"code": "print(1)", "env": ["a"]},
+        {"code": "print(1)", "env": {"A": 1}},
+        {"code": "print(1)", "entrypoint": 5},
+        {"code": b"\xff"},
+    ],
+)
+def test_incorrect_json_error_when_frame_fields_have_wrong_types(
+    client, frame
+):
+    response = client.post(
+        endpoint,
+        headers={"Content-Type": MSGPACK_MIMETYPE},
+        data=pack_frame(frame),
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Incorrect JSON schema"
+
+
+def test_incorrect_json_error_when_file_content_has_wrong_type(client):
+    response = client.post(endpoint, json={"files": {"main.py": 5}})
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Incorrect JSON schema"
@@ -0,0 +1,156 @@
+import pytest
+
+from feather_python import service
+from feather_python.jobs import (
+    JobPriority,
+    JobQueue,
+    JobStatus,
+    JobWorker,
+)
+
+
+@pytest.fixture()
+def job_queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"), lease_duration=60)
+
+
+@pytest.fixture()
+def app_job_queue(monkeypatch, job_queue):
+    monkeypatch.setattr(service, "job_queue", job_queue)
+    return job_queue
+
+
+def test_jobs_are_leased_by_priority_then_age(job_queue):
+    bulk = job_queue.submit("run", b"bulk", JobPriority.BULK)
+    interactive = job_queue.submit("run", b"1", JobPriority.INTERACTIVE)
+    interactive2 = job_queue.submit("run", b"2", JobPriority.INTERACTIVE)
+
+    leased = [job_queue.lease("worker").id for _ in range(3)]
+
+    assert leased == [interactive.id, interactive2.id, bulk.id]
+    assert job_queue.lease("worker") is None
+
+
+def test_completed_job_keeps_its_result(job_queue):
+    job = job_queue.submit("run", b"payload", JobPriority.BULK)
+
+    leased = job_queue.lease("worker")
+    assert leased.status == JobStatus.RUNNING
+    assert job_queue.complete(leased, "worker", b"result")
+
+    job = job_queue.get(job.id)
+    assert job.status == JobStatus.DONE
+    assert job.result == b"result"
+    assert job.attempts == 1
+
+
+def test_expired_lease_is_requeued(job_queue):
+    job_queue.lease_duration = -1
+    job = job_queue.submit("run", b"payload", JobPriority.BULK)
+
+    first = job_queue.lease("crashed-worker")
+    second = job_queue.lease("other-worker")
+
+    assert first.id == second.id == job.id
+    assert second.attempts == 2
+
+    # the crashed worker lost its lease and can't overwrite the result
+    assert not job_queue.complete(first, "crashed-worker", b"stale")
+    assert job_queue.complete(second, "other-worker", b"fresh")
+    assert job_queue.get(job.id).result == b"fresh"
+
+
+def test_job_fails_after_max_attempts(job_queue):
+    job_queue.lease_duration = -1
+    job = job_queue.submit("run", b"payload", JobPriority.BULK)
+
+    for _ in range(job_queue.max_attempts):
+        assert job_queue.lease("worker").id == job.id
+
+    assert job_queue.lease("worker") is None
+    assert job_queue.get(job.id).status == JobStatus.FAILED
+
+
+def test_job_worker_runs_leased_jobs(job_queue):
+    ok = job_queue.submit("run", b"ok", JobPriority.BULK)
+    failing = job_queue.submit("run", b"fail", JobPriority.BULK)
+    worker = JobWorker(
+        job_queue, handler=lambda job: (job.payload == b"ok", b"result")
+    )
+
+    assert worker.run_once("worker").id == ok.id
+    assert worker.run_once("worker").id == failing.id
+    assert worker.run_once("worker") is None
+
+    assert job_queue.get(ok.id).status == JobStatus.DONE
+    assert job_queue.get(failing.id).status == JobStatus.FAILED
+
+
+def test_job_worker_only_leases_with_idle_capacity(job_queue):
+    job = job_queue.submit("run", b"ok", JobPriority.BULK)
+    worker_load = service.WorkerLoad(capacity=1)
+    worker = JobWorker(
+        job_queue,
+        handler=lambda job: (True, b"result"),
+        has_capacity=worker_load.has_capacity,
+    )
+
+    with worker_load:
+        assert worker.run_once("worker") is None
+        assert job_queue.get(job.id).status == JobStatus.QUEUED
+
+    assert worker.run_once("worker").id == job.id
+
+
+def test_submit_and_get_job(client, app_job_queue):
+    response = client.post(
+        "/runtimes/python/jobs",
+        headers={"x-feather-priority": "interactive"},
+        json={"files": {"main.py": "print('hello, world!')"}},
+    )
+
+    assert response.status_code == 202
+    assert response.json["status"] == "queued"
+    job_id = response.json["id"]
+
+    JobWorker(app_job_queue, handler=service.run_job).run_once("worker")
+
+    response = client.get(f"/runtimes/python/jobs/{job_id}")
+
+    assert response.status_code == 200
+    assert response.json["status"] == "done"
+    assert response.json["result"]["exit_code"] == 0
+    assert response.json["result"]["stdout"] == "hello, world!\n"
+
+
+def test_job_with_feather_error_fails(client, app_job_queue):
+    response = client.post(
+        "/runtimes/python/jobs",
+        json={"files": {"not_main.py": "print('hello, world!')"}},
+    )
+    job_id = response.json["id"]
+
+    JobWorker(app_job_queue, handler=service.run_job).run_once("worker")
+
+    response = client.get(f"/runtimes/python/jobs/{job_id}")
+
+    assert response.json["status"] == "failed"
+    assert response.json["result"]["error"] == "Entrypoint not found"
+
+
+def test_get_job_not_found(client, app_job_queue):
+    response = client.get("/runtimes/python/jobs/does-not-exist")
+
+    assert response.status_code == 404
+    assert response.json["error"] == "Job not found"
+
+
+def test_submit_job_with_invalid_priority(client, app_job_queue):
+    response = client.post(
+        "/runtimes/python/jobs",
+        headers={"x-feather-priority": "urgent"},
+        data="print('hello, world!')",
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Invalid priority"
@@ -4,6 +4,7 @@ from flask import request
 from io import BytesIO
 
 from feather_python.models import RunRequest, RunRequestMode
+from feather_python.protocol import MSGPACK_MIMETYPE, pack_frame
 
 
 def test_get_runrequest_from_flask_request_with_multipart(app):
@@ -155,3 +156,105 @@ def test_get_runrequest_from_flask_request_with_args(app):
         run_request = RunRequest.from_request(request)
 
         assert run_request.args == ["foo", "bar bar", '"baz baz"']
+
+
+def test_get_runrequest_from_flask_request_with_msgpack(app):
+    test_files = {
+        "main.py": b"import data",
+        "data.bin": b"\x00\xff binary content",
+    }
+    frame = pack_frame(
+        {"files": test_files, "args": ["foo"], "env": {"a": "b"}}
+    )
+
+    with app.test_request_context(
+        "/runtimes/python",
+        method="POST",
+        data=frame,
+        headers={"Content-Type": MSGPACK_MIMETYPE},
+    ):
+        run_request = RunRequest.from_request(request)
+
+        assert run_request.code is None
+        assert run_request.mode == RunRequestMode.FILES
+        assert run_request.args == ["foo"]
+        assert run_request.env == {"a": "b"}
+
+        for filename, content in test_files.items():
+            file = run_request.files[filename]
+            assert file.filename == filename
+            assert file.stream.read() == content
+
+
+def test_get_runrequest_from_flask_request_with_msgpack_code(app):
+    code = """print("Hello from inside a test, world!")"""
+
+    with app.test_request_context(
+        "/runtimes/python",
+        method="POST",
+        data=pack_frame({"code": code}),
+        headers={
+            "Content-Type": MSGPACK_MIMETYPE,
+            "x-feather-args": "foo bar",
+        },
+    ):
+        run_request = RunRequest.from_request(request)
+
+        assert run_request.files is None
+        assert run_request.mode == RunRequestMode.CODE
+        assert run_request.code == code
+        assert run_request.args == ["foo", "bar"]
+
+
+def test_runrequest_fingerprint(app):
+    files = {"main.py": "print('hi')", "data.txt": "some data"}
+
+    def get_run_request(files, headers=None):
+        with app.test_request_context(
+            "/runtimes/python",
+            method="POST",
+            json={"files": files},
+            headers=headers,
+        ):
+            return RunRequest.from_request(request)
+
+    run_request = get_run_request(files)
+    fingerprint = run_request.fingerprint()
+
+    assert fingerprint == get_run_request(dict(files)).fingerprint()
+    assert (
+        fingerprint
+        != get_run_request({**files, "data.txt": "other"}).fingerprint()
+    )
+    assert (
+        fingerprint
+        != get_run_request(files, {"x-feather-args": "foo"}).fingerprint()
+    )
+
+    # the streams are rewound, so the files can still be saved
+    assert run_request.files["main.py"].stream.read() == b"print('hi')"
+
+
+def test_get_runrequest_from_flask_request_with_deduplicate(app):
+    with app.test_request_context(
+        "/runtimes/python",
+        method="POST",
+        data="print('hi')",
+        headers={"x-feather-deduplicate": "1"},
+    ):
+        run_request = RunRequest.from_request(request)
+
+        assert run_request.deduplicate is True
+
+
+def test_get_runrequest_from_flask_request_with_exercise(app):
+    with app.test_request_context(
+        "/runtimes/python",
+        method="POST",
+        data="print('hi')",
+        headers={"x-feather-exercise": "fizzbuzz"},
+    ):
+        run_request = RunRequest.from_request(request)
+
+        assert run_request.exercise == "fizzbuzz"
+        assert run_request.to_frame()["exercise"] == "fizzbuzz"
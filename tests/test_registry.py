@@ -0,0 +1,52 @@
+import sys
+
+import pytest
+
+from feather_python.errors import UnsupportedPythonVersionError
+from feather_python.registry import Interpreter, RuntimeRegistry
+
+
+def get_current_version():
+    return "%d.%d" % sys.version_info[:2]
+
+
+def test_registry_from_empty_config_uses_default_python_path():
+    registry = RuntimeRegistry.from_config("", sys.executable)
+
+    interpreter = registry.get()
+    assert interpreter.name == "default"
+    assert interpreter.python_path == sys.executable
+    assert interpreter.short_version == get_current_version()
+    assert registry.get(get_current_version()) is interpreter
+
+
+def test_registry_from_config_with_launch_profile():
+    config = f"'current={sys.executable} -I -B'"
+    registry = RuntimeRegistry.from_config(config, "python3")
+
+    interpreter = registry.get("current")
+    assert interpreter is registry.default
+    assert interpreter.python_path == sys.executable
+    assert interpreter.flags == ["-I", "-B"]
+    assert interpreter.implementation == sys.implementation.name
+
+
+def test_registry_skips_interpreters_that_do_not_start():
+    config = f"broken=/does/not/exist/python current={sys.executable}"
+    registry = RuntimeRegistry.from_config(config, "python3")
+
+    assert registry.default.name == "current"
+    with pytest.raises(UnsupportedPythonVersionError):
+        registry.get("broken")
+
+
+def test_registry_without_usable_interpreters():
+    with pytest.raises(RuntimeError):
+        RuntimeRegistry.from_config("broken=/does/not/exist/python", "")
+
+
+def test_interpreter_probe_caches_version():
+    interpreter = Interpreter("current", sys.executable).probe()
+
+    assert interpreter.version.startswith(get_current_version() + ".")
+    assert interpreter.executable
@@ -0,0 +1,86 @@
+import sys
+import textwrap
+import time
+
+import pytest
+
+from feather_python.errors import RunTimeoutError
+from feather_python.runtime import run_process
+
+
+def spawn_grandchild_code(pid_path, **popen_kwargs):
+    # the child starts a long-lived grandchild, records its pid and exits
+    return textwrap.dedent(
+        f"""
+        import subprocess
+        proc = subprocess.Popen(["sleep", "30"], **{popen_kwargs!r})
+        with open({str(pid_path)!r}, "w") as f:
+            f.write(str(proc.pid))
+        """
+    )
+
+
+def has_exited(pid, timeout=2):
+    # SIGKILL is delivered asynchronously; a killed orphan is a zombie
+    # until init reaps it
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                state = f.read().rsplit(")", 1)[-1].split()[0]
+        except FileNotFoundError:
+            return True
+        if state == "Z":
+            return True
+        time.sleep(0.05)
+
+    return False
+
+
+def test_run_process_returns_output_and_exit_code():
+    returncode, stdout, stderr, usage = run_process(
+        [sys.executable, "-c", "import sys; print('hi'); sys.exit(3)"],
+        env=None,
+        timeout=10,
+    )
+
+    assert returncode == 3
+    assert stdout == b"hi\n"
+    assert stderr == b""
+    assert usage.ru_utime >= 0
+
+
+def test_run_process_times_out():
+    started_at = time.monotonic()
+    with pytest.raises(RunTimeoutError):
+        run_process(
+            [sys.executable, "-c", "while True: pass"], env=None, timeout=1
+        )
+
+    assert time.monotonic() - started_at < 5
+
+
+def test_run_process_times_out_on_grandchild_holding_the_pipes(tmp_path):
+    pid_path = tmp_path / "grandchild.pid"
+    code = spawn_grandchild_code(pid_path)
+
+    started_at = time.monotonic()
+    with pytest.raises(RunTimeoutError):
+        run_process([sys.executable, "-c", code], env=None, timeout=1)
+
+    assert time.monotonic() - started_at < 5
+    assert has_exited(int(pid_path.read_text()))
+
+
+def test_run_process_kills_detached_grandchildren(tmp_path):
+    pid_path = tmp_path / "grandchild.pid"
+    code = spawn_grandchild_code(
+        pid_path, stdout=-3, stderr=-3  # subprocess.DEVNULL
+    )
+
+    returncode, _, _, _ = run_process(
+        [sys.executable, "-c", code], env=None, timeout=10
+    )
+
+    assert returncode == 0
+    assert has_exited(int(pid_path.read_text()))
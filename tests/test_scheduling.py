@@ -0,0 +1,108 @@
+import pytest
+
+from feather_python.errors import NoWorkerAvailableError
+from feather_python.scheduling import CostModel, Lane
+
+
+def test_cost_model_needs_samples_to_predict():
+    cost_model = CostModel(max_timeout=30, heavy_threshold=5, min_samples=3)
+    cost_model.record("key", 0.1)
+    cost_model.record("key", 0.2)
+
+    assert cost_model.predict("key") is None
+    assert cost_model.get_timeout("key") == 30
+
+    cost_model.record("key", 0.3)
+
+    assert cost_model.predict("key") == 0.3
+
+
+def test_cost_model_tightens_timeout_for_fast_runs():
+    cost_model = CostModel(
+        max_timeout=30, heavy_threshold=5, min_timeout=2, headroom=4
+    )
+    for wall_time in (0.1, 0.2, 0.1):
+        cost_model.record("fast", wall_time)
+    for wall_time in (1, 2, 3):
+        cost_model.record("medium", wall_time)
+    for wall_time in (9, 10, 8):
+        cost_model.record("slow", wall_time)
+
+    assert cost_model.get_timeout("fast") == 2
+    assert cost_model.get_timeout("medium") == 12
+    assert cost_model.get_timeout("slow") == 30
+    assert cost_model.get_timeout("unknown") == 30
+
+
+def test_cost_model_marks_slow_keys_heavy():
+    cost_model = CostModel(max_timeout=30, heavy_threshold=5, min_samples=3)
+    for wall_time in (0.1, 0.2, 0.1):
+        cost_model.record("fast", wall_time)
+    for wall_time in (6, 30, 8):
+        cost_model.record("slow", wall_time)
+    cost_model.record("new", 30)
+
+    assert not cost_model.is_heavy("fast")
+    assert cost_model.is_heavy("slow")
+    assert not cost_model.is_heavy("new")
+    assert not cost_model.is_heavy("unknown")
+
+
+def test_cost_model_ignores_one_runaway_run_for_heaviness():
+    cost_model = CostModel(max_timeout=30, heavy_threshold=5, min_samples=3)
+    for wall_time in (0.1, 30, 0.2, 0.1):
+        cost_model.record("key", wall_time)
+
+    assert not cost_model.is_heavy("key")
+
+
+def test_cost_model_loosens_timeout_after_timeouts():
+    cost_model = CostModel(
+        max_timeout=30, heavy_threshold=5, min_timeout=2, headroom=4
+    )
+    for wall_time in (0.05, 0.05, 0.05):
+        cost_model.record("key", wall_time)
+    assert cost_model.get_timeout("key") == 2
+
+    # a valid 3s solution is killed at 2s, recorded as taking at least 2s
+    cost_model.record("key", cost_model.get_timeout("key"))
+
+    assert cost_model.get_timeout("key") == 8
+
+
+def test_cost_model_keeps_a_window_of_recent_runs():
+    cost_model = CostModel(
+        max_timeout=30, heavy_threshold=5, min_samples=1, window=2
+    )
+    for wall_time in (10, 0.1, 0.2):
+        cost_model.record("key", wall_time)
+
+    assert cost_model.predict("key") == 0.2
+    assert not cost_model.is_heavy("key")
+
+
+def test_cost_model_forgets_least_recently_used_keys():
+    cost_model = CostModel(
+        max_timeout=30, heavy_threshold=5, min_samples=1, max_keys=2
+    )
+    cost_model.record("a", 1)
+    cost_model.record("b", 1)
+    cost_model.record("a", 1)
+    cost_model.record("c", 1)
+
+    assert cost_model.predict("a") == 1
+    assert cost_model.predict("b") is None
+    assert cost_model.predict("c") == 1
+
+
+def test_lane_is_bounded():
+    lane = Lane(capacity=1, wait_timeout=0.05)
+
+    with lane:
+        with pytest.raises(NoWorkerAvailableError):
+            with lane:
+                pass
+
+    # the slot is free again once the first run leaves
+    with lane:
+        pass
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from feather_python.errors import RunTimeoutError
+from feather_python.singleflight import SingleFlight
+
+
+def run_concurrently(fn, count):
+    results = [None] * count
+
+    def target(i):
+        try:
+            results[i] = fn()
+        except Exception as e:
+            results[i] = e
+
+    threads = [
+        threading.Thread(target=target, args=(i,)) for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    single_flight = SingleFlight()
+    calls = []
+
+    def slow_call():
+        calls.append(1)
+        time.sleep(0.2)
+        return "result"
+
+    results = run_concurrently(
+        lambda: single_flight.do("key", slow_call, timeout=5), count=5
+    )
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_single_flight_runs_again_after_completion():
+    single_flight = SingleFlight()
+    calls = []
+
+    def call():
+        calls.append(1)
+        return len(calls)
+
+    assert single_flight.do("key", call, timeout=5) == 1
+    assert single_flight.do("key", call, timeout=5) == 2
+
+
+def test_single_flight_shares_leader_errors():
+    single_flight = SingleFlight()
+
+    def failing_call():
+        time.sleep(0.2)
+        raise ValueError("leader failed")
+
+    results = run_concurrently(
+        lambda: single_flight.do("key", failing_call, timeout=5), count=3
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_single_flight_followers_are_bounded_by_timeout():
+    single_flight = SingleFlight()
+    leader_started = threading.Event()
+
+    def slow_call():
+        leader_started.set()
+        time.sleep(0.5)
+        return "result"
+
+    leader = threading.Thread(
+        target=single_flight.do, args=("key", slow_call, 5)
+    )
+    leader.start()
+    leader_started.wait()
+
+    with pytest.raises(RunTimeoutError):
+        single_flight.do("key", slow_call, timeout=0.05)
+
+    leader.join()
@@ -0,0 +1,164 @@
+import io
+import os
+import tempfile
+
+import pytest
+
+from feather_python.errors import InvalidFilepathError
+from feather_python.models import create_filestorage
+from feather_python import workspace
+from feather_python.workspace import (
+    UploadFile,
+    WorkspacePlan,
+    save_file,
+    split_path,
+)
+
+
+def get_plan(files):
+    return WorkspacePlan.from_files(
+        {
+            filepath: create_filestorage(filepath, content)
+            for filepath, content in files.items()
+        }
+    )
+
+
+@pytest.mark.parametrize(
+    "filepath, expected_parts",
+    [
+        ("main.py", ("main.py",)),
+        ("foo/bar.py", ("foo", "bar.py")),
+        ("./foo//bar.py", ("foo", "bar.py")),
+        ("..foo/bar..py", ("..foo", "bar..py")),
+    ],
+)
+def test_split_path(filepath, expected_parts):
+    assert split_path(filepath) == expected_parts
+
+
+@pytest.mark.parametrize(
+    "filepath",
+    ["", ".", "/foo.py", "../foo.py", "foo/../../bar.py", "../a/x.py", "a\0b"],
+)
+def test_split_path_rejects_paths_outside_workspace(filepath):
+    with pytest.raises(InvalidFilepathError):
+        split_path(filepath)
+
+
+def test_plan_computes_each_directory_once():
+    plan = get_plan(
+        {
+            "main.py": "",
+            "foo/a.py": "",
+            "foo/b.py": "",
+            "foo/bar/c.py": "",
+            "baz/d.py": "",
+        }
+    )
+
+    assert sorted(plan.dirs) == [("baz",), ("foo",), ("foo", "bar")]
+    assert plan.dirs.index(("foo",)) < plan.dirs.index(("foo", "bar"))
+
+
+def test_plan_rejects_duplicate_paths():
+    with pytest.raises(InvalidFilepathError):
+        get_plan({"foo/a.py": "", "foo//a.py": ""})
+
+
+def test_plan_rejects_file_that_is_also_a_directory():
+    with pytest.raises(InvalidFilepathError):
+        get_plan({"foo": "", "foo/a.py": ""})
+
+
+def test_plan_create_writes_files(tmp_path):
+    get_plan({"main.py": "main", "foo/bar/c.py": "nested"}).create(
+        str(tmp_path)
+    )
+
+    assert (tmp_path / "main.py").read_text() == "main"
+    assert (tmp_path / "foo" / "bar" / "c.py").read_text() == "nested"
+
+
+def test_plan_create_does_not_follow_symlinks(tmp_path):
+    workspace, outside = tmp_path / "workspace", tmp_path / "outside.py"
+    workspace.mkdir()
+    outside.write_text("outside")
+    os.symlink(outside, workspace / "main.py")
+
+    with pytest.raises(OSError):
+        get_plan({"main.py": "overwritten"}).create(str(workspace))
+
+    assert outside.read_text() == "outside"
+
+
+@pytest.mark.parametrize("size", [10, 1024 * 1024])
+def test_save_file_copies_spooled_uploads(tmp_path, size):
+    # small spools stay in memory, large ones roll over to disk
+    spool = tempfile.SpooledTemporaryFile(max_size=1024)
+    spool.write(b"x" * size)
+    spool.seek(0)
+
+    with open(tmp_path / "main.py", "wb") as dst:
+        save_file(spool, dst)
+
+    assert (tmp_path / "main.py").read_bytes() == b"x" * size
+
+
+def test_save_file_writes_from_current_position(tmp_path):
+    stream = io.BytesIO(b"skip:keep")
+    stream.seek(5)
+
+    with open(tmp_path / "main.py", "wb") as dst:
+        save_file(stream, dst)
+
+    assert (tmp_path / "main.py").read_bytes() == b"keep"
+
+
+def get_upload_file(dir, content):
+    upload = UploadFile(dir=str(dir))
+    upload.write(content)
+    upload.seek(0)
+    return upload
+
+
+def test_plan_create_links_upload_files(tmp_path):
+    workspace_path = tmp_path / "workspace"
+    workspace_path.mkdir()
+    upload = get_upload_file(tmp_path, b"print('hi')")
+
+    WorkspacePlan.from_files({"main.py": upload}).create(str(workspace_path))
+
+    assert (workspace_path / "main.py").read_bytes() == b"print('hi')"
+    assert os.stat(workspace_path / "main.py").st_ino == os.stat(
+        upload.path
+    ).st_ino
+
+    upload.close()
+    assert not os.path.exists(upload.path)
+    assert (workspace_path / "main.py").read_bytes() == b"print('hi')"
+
+
+def test_plan_create_copies_upload_files_that_cant_be_linked(
+    tmp_path, monkeypatch
+):
+    def cross_device_link(*args, **kwargs):
+        raise OSError(18, "Invalid cross-device link")
+
+    sendfile_calls = []
+
+    def spy_sendfile(src, dst):
+        sendfile_calls.append(src)
+        real_sendfile(src, dst)
+
+    real_sendfile = workspace.sendfile
+    monkeypatch.setattr(workspace.os, "link", cross_device_link)
+    monkeypatch.setattr(workspace, "sendfile", spy_sendfile)
+    workspace_path = tmp_path / "workspace"
+    workspace_path.mkdir()
+    upload = get_upload_file(tmp_path, b"x" * 100000)
+
+    WorkspacePlan.from_files({"main.py": upload}).create(str(workspace_path))
+
+    assert (workspace_path / "main.py").read_bytes() == b"x" * 100000
+    assert sendfile_calls == [upload]
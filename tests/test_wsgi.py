@@ -0,0 +1,157 @@
+import gzip
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+from werkzeug.test import Client
+
+from feather_python.wsgi import application, is_hot_request
+from tests.conftest import get_run_endpoint
+
+endpoint = get_run_endpoint()
+
+# seconds; importing Flask alone takes longer than this
+IMPORT_TIME_BUDGET = float(os.getenv("FEATHER_IMPORT_TIME_BUDGET", 0.15))
+
+
+@pytest.fixture()
+def wsgi_client():
+    return Client(application)
+
+
+def test_hot_path_runs_code(wsgi_client):
+    response = wsgi_client.post(
+        endpoint,
+        headers={"x-feather-args": "foo bar"},
+        data="import sys; print(sys.argv[1:])",
+    )
+
+    assert response.status_code == 200
+    assert response.text == "['foo', 'bar']\n"
+
+
+def test_hot_path_returns_stderr_on_error(wsgi_client):
+    response = wsgi_client.post(
+        endpoint, data="raise Exception('test exception')"
+    )
+
+    assert response.status_code == 200
+    assert "Exception: test exception" in response.text
+
+
+def test_hot_path_returns_feather_errors_as_json(wsgi_client):
+    response = wsgi_client.post(
+        endpoint, headers={"Content-Type": "text/plain"}, data=""
+    )
+
+    assert response.status_code == 400
+    assert response.json["error"] == "Code not found"
+
+
+def test_hot_path_compresses_large_output(wsgi_client):
+    response = wsgi_client.post(
+        endpoint,
+        headers={"Accept-Encoding": "gzip"},
+        data="print('x' * 100000)",
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == b"x" * 100000 + b"\n"
+
+
+@pytest.mark.parametrize(
+    "headers, code",
+    [
+        ({}, "print('hi')"),
+        ({"Origin": "https://example.com"}, "print('hi')"),
+        (
+            {"Origin": "https://example.com", "Accept-Encoding": "gzip"},
+            "print('x' * 100000)",
+        ),
+        ({"Origin": "https://example.com"}, "raise Exception('error')"),
+        (
+            {
+                "Origin": "https://example.com",
+                "x-feather-python-version": "0.1",
+            },
+            "0",
+        ),
+    ],
+)
+def test_hot_path_headers_match_the_flask_app(app, wsgi_client, headers, code):
+    # the Flask app answers the same request through its own client
+    flask_response = app.test_client().post(
+        endpoint, headers=headers, data=code
+    )
+    response = wsgi_client.post(endpoint, headers=headers, data=code)
+
+    assert response.status_code == flask_response.status_code
+    assert sorted(response.headers.items()) == sorted(
+        flask_response.headers.items()
+    )
+
+
+def test_other_requests_go_to_the_flask_app(wsgi_client):
+    response = wsgi_client.post(
+        endpoint,
+        json={"files": {"main.py": "print('hello, world!')"}},
+        headers={"Accept": "application/json"},
+    )
+
+    assert response.status_code == 200
+    assert response.json["stdout"] == "hello, world!\n"
+
+
+@pytest.mark.parametrize(
+    "accept, is_hot",
+    [
+        ("", True),
+        ("*/*", True),
+        ("application/json;q=0, text/plain", True),
+        ("application/json", False),
+        ("text/plain;q=0.5, application/msgpack;q=0.1", False),
+    ],
+)
+def test_hot_path_follows_app_accept_rule(accept, is_hot):
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": endpoint,
+        "CONTENT_LENGTH": "10",
+        "HTTP_ACCEPT": accept,
+    }
+
+    assert is_hot_request(environ) is is_hot
+
+
+def test_import_is_lean_and_within_budget():
+    code = textwrap.dedent(
+        """
+        import sys, time
+
+        started_at = time.perf_counter()
+        import feather_python.wsgi
+        print(time.perf_counter() - started_at)
+        print(",".join(sorted(sys.modules)))
+        """
+    )
+
+    def measure():
+        proc = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        duration, modules = proc.stdout.splitlines()
+        return float(duration), modules.split(",")
+
+    # best of three, to keep the test stable on a busy machine
+    durations, modules = zip(*(measure() for _ in range(3)))
+
+    assert "flask" not in modules[0]
+    assert "werkzeug" not in modules[0]
+    assert "msgpack" not in modules[0]
+    assert "sqlite3" not in modules[0]
+    assert min(durations) < IMPORT_TIME_BUDGET